@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from sonar_sweep import open_depth_file, read_depth_values, write_depth_values_binary
+
+
+def main():
+    """ Read in a file that contains water depth values. One value per line.
+        Write the values to a binary file of fixed-width 32-bit integers. The
+        sonar sweep scripts can memory map the binary file (--binary) instead
+        of parsing the text file again.
+    """
+    ###########################################################################
+    # Command line argument parser
+    ###########################################################################
+
+    description = "Convert a text file of depth values to a binary file of 32-bit integers."
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("file", help="Text file with depth values. One value per line. Use - to read stdin.")
+    parser.add_argument("output", help="Binary file to write the depth values to.")
+
+    args = parser.parse_args()
+
+    ###########################################################################
+    # Convert values
+    ###########################################################################
+
+    try:
+        with open_depth_file(args.file) as FILE, open(args.output, 'wb') as OUTPUT:
+            depth_value_count = write_depth_values_binary(read_depth_values(FILE), OUTPUT)
+    except Exception:
+        raise
+
+    ###########################################################################
+    # Report
+    ###########################################################################
+
+    print("Reading values from the file: {}".format(args.file))
+    print("Writing values to the file:   {}".format(args.output))
+    print("Total number of depth values: {}".format(depth_value_count))
+
+    exit(0)
+
+
+if __name__ == "__main__":
+    main()
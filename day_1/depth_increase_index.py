@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+import argparse
+import struct
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+from sonar_sweep import load_depth_values_binary, numpy, open_depth_file, read_depth_values
+
+# Number of bits in a word of the bitset
+WORD_BITS = 64
+
+# Number of words per block. The number of increases before each block is
+# stored, so a rank query only has to count the bits of a few words.
+BLOCK_WORDS = 8
+
+# Index file header. Magic, window size, number of depth values, number of
+# words.
+INDEX_HEADER = struct.Struct("<4sQQQ")
+INDEX_MAGIC = b"DIDX"
+
+
+class DepthIncreaseIndex(object):
+    """ A rank/select index over sliding window depth increases. Bit i of the
+        bitset is set when the window ending at depth value i is larger than
+        the window ending at depth value i-1. The number of increases before
+        each block of words is kept so increases can be counted over any range
+        in O(1).
+
+        Input:  window size <int>
+                number of depth values <int>
+                bitset words array('Q')
+                increases before each block array('Q')
+    """
+    def __init__(self, number, depth_value_count, words, block_counts):
+        # Number of values in a window
+        self.__number = number
+
+        # Number of depth values (bits) in the index
+        self.__depth_value_count = depth_value_count
+
+        # Packed increase flags. 64 flags per word.
+        self.__words = words
+
+        # Number of increases before each block. One extra entry at the end
+        # holds the total number of increases.
+        self.__block_counts = block_counts
+
+    def countIncreases(self, first, last):
+        """ Count the depth increases from the first to the last depth value
+            (inclusive). Depth values are numbered from 0.
+
+            Input:  first depth value <int>
+                    last depth value <int>
+
+            Output: number of depth increases <int>
+        """
+        # Clamp the range to the depth values in the index
+        first = max(first, 0)
+        last = min(last, self.__depth_value_count - 1)
+
+        if first > last:
+            return 0
+
+        return self.rank(last + 1) - self.rank(first)
+
+    def findIncrease(self, k):
+        """ Find the depth value where the k-th depth increase happened. The
+            first increase is k = 1.
+
+            Input:  k <int>
+
+            Output: depth value number, -1 if there are fewer than k increases <int>
+        """
+        if k < 1 or k > self.__block_counts[-1]:
+            return -1
+
+        # The block with the k-th increase. The last block with fewer than k
+        # increases before it.
+        block = bisect_left(self.__block_counts, k) - 1
+        k -= self.__block_counts[block]
+
+        # The word with the k-th increase
+        word_index = block * BLOCK_WORDS
+        while self.__words[word_index].bit_count() < k:
+            k -= self.__words[word_index].bit_count()
+            word_index += 1
+
+        # The bit with the k-th increase
+        word = self.__words[word_index]
+        for _ in range(k - 1):
+            # Clear the lowest set bit
+            word &= word - 1
+
+        return word_index * WORD_BITS + (word & -word).bit_length() - 1
+
+    def getDepthValueCount(self):
+        """ Get the number of depth values in the index.
+
+            Input:  None
+
+            Output: number of depth values <int>
+        """
+        return self.__depth_value_count
+
+    def getIncreaseCount(self):
+        """ Get the total number of depth increases.
+
+            Input:  None
+
+            Output: number of depth increases <int>
+        """
+        return self.__block_counts[-1]
+
+    def getNumber(self):
+        """ Get the window size the index was built for.
+
+            Input:  None
+
+            Output: number of values in a window <int>
+        """
+        return self.__number
+
+    def rank(self, position):
+        """ Count the depth increases before the given depth value.
+
+            Input:  depth value number <int>
+
+            Output: number of depth increases <int>
+        """
+        word_index, bit = divmod(position, WORD_BITS)
+        block = word_index // BLOCK_WORDS
+
+        # Increases before the block
+        count = self.__block_counts[block]
+
+        # Increases in the whole words before the word with the position
+        for index in range(block * BLOCK_WORDS, word_index):
+            count += self.__words[index].bit_count()
+
+        # Increases in the word before the position
+        if bit:
+            count += (self.__words[word_index] & ((1 << bit) - 1)).bit_count()
+
+        return count
+
+    def save(self, file_name):
+        """ Save the index to the given file.
+
+            Input:  index file name <str>
+
+            Output: None
+        """
+        with open(file_name, 'wb') as FILE:
+            FILE.write(INDEX_HEADER.pack(INDEX_MAGIC, self.__number, self.__depth_value_count, len(self.__words)))
+            self.__words.tofile(FILE)
+            self.__block_counts.tofile(FILE)
+
+
+def build_depth_increase_index(depth_values, number=3):
+    """ Build a depth increase index from the given depth values. A NumPy
+        array (e.g. a memory mapped binary depth file) is packed with
+        vectorized comparisons. Anything else is read one value at a time.
+
+        Input:  depth values [ depth value <int> ]
+                number of values in a window <int>
+
+        Output: depth increase index <DepthIncreaseIndex>
+    """
+    words = array('Q')
+
+    # Vectorized. Compare each value with the value "number" positions before
+    # it and pack the flags 64 at a time.
+    if numpy is not None and isinstance(depth_values, numpy.ndarray):
+        depth_value_count = len(depth_values)
+
+        flags = numpy.zeros(depth_value_count, dtype=numpy.uint8)
+        flags[number:] = depth_values[:-number] < depth_values[number:]
+
+        packed = numpy.packbits(flags, bitorder='little')
+        packed = numpy.pad(packed, (0, -len(packed) % 8))
+        words.frombytes(packed.astype(numpy.uint8).tobytes())
+    # One value at a time
+    else:
+        # The last "number" depth values
+        window = deque(maxlen=number)
+
+        word = 0
+        depth_value_count = 0
+
+        for depth_value in depth_values:
+            # The value leaving the window is compared with the value entering it
+            if len(window) == number and window[0] < depth_value:
+                word |= 1 << (depth_value_count % WORD_BITS)
+
+            window.append(depth_value)
+            depth_value_count += 1
+
+            # The word is full
+            if depth_value_count % WORD_BITS == 0:
+                words.append(word)
+                word = 0
+
+        # Partial last word
+        if depth_value_count % WORD_BITS:
+            words.append(word)
+
+    # Number of increases before each block, plus the total at the end
+    block_counts = array('Q', [0])
+    for start in range(0, len(words), BLOCK_WORDS):
+        block_counts.append(block_counts[-1] + sum(word.bit_count() for word in words[start:start+BLOCK_WORDS]))
+
+    return DepthIncreaseIndex(number, depth_value_count, words, block_counts)
+
+
+def load_depth_increase_index(file_name):
+    """ Load a depth increase index saved with DepthIncreaseIndex.save().
+
+        Input:  index file name <str>
+
+        Output: depth increase index <DepthIncreaseIndex>
+    """
+    with open(file_name, 'rb') as FILE:
+        magic, number, depth_value_count, word_count = INDEX_HEADER.unpack(FILE.read(INDEX_HEADER.size))
+
+        if magic != INDEX_MAGIC:
+            raise ValueError("Not a depth increase index file: {}".format(file_name))
+
+        words = array('Q')
+        words.fromfile(FILE, word_count)
+
+        block_counts = array('Q')
+        block_counts.fromfile(FILE, -(-word_count // BLOCK_WORDS) + 1)
+
+    return DepthIncreaseIndex(number, depth_value_count, words, block_counts)
+
+
+def main():
+    """ Build a rank/select index of the depth increases in a file of depth
+        values, or answer range and k-th increase queries with a saved index.
+    """
+    ###########################################################################
+    # Command line argument parser
+    ###########################################################################
+
+    description = "Build a depth increase index, or query a saved one. Depth values are\n" \
+                  "numbered from 0. A depth value is an increase when the window ending\n" \
+                  "at it is larger than the window ending at the value before it."
+
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build an index from a file of depth values.")
+    build_parser.add_argument("file", help="Text file with depth values. One value per line. Use - to read stdin.")
+    build_parser.add_argument("index", help="Index file to write.")
+    build_parser.add_argument("-n", "--number", type=int, help="Number of values to add together for comparison", default=3)
+    build_parser.add_argument("-b", "--binary", action="store_true", help="File is a binary depth value file (see convert_depth_values.py)")
+
+    query_parser = subparsers.add_parser("query", help="Query a saved index.")
+    query_parser.add_argument("index", help="Index file to read.")
+    query_parser.add_argument("-r", "--range", type=int, nargs=2, action="append", default=[], metavar=("FIRST", "LAST"), help="Count the increases from the first to the last depth value")
+    query_parser.add_argument("-k", "--select", type=int, action="append", default=[], help="Find the depth value of the k-th increase")
+
+    args = parser.parse_args()
+
+    ###########################################################################
+    # Build
+    ###########################################################################
+
+    if args.command == "build":
+        # Binary mode. Memory map the 32-bit integers and pack them vectorized.
+        if args.binary:
+            index = build_depth_increase_index(load_depth_values_binary(args.file), args.number)
+        else:
+            try:
+                with open_depth_file(args.file) as FILE:
+                    index = build_depth_increase_index(read_depth_values(FILE), args.number)
+            except Exception:
+                raise
+
+        index.save(args.index)
+
+        print("Reading values from the file: {}".format(args.file))
+        print("Number of values to consider: {}".format(args.number))
+        print("Total number of depth values: {}".format(index.getDepthValueCount()))
+        print("Number of depth increases is: {}".format(index.getIncreaseCount()))
+        print("Index written to the file:    {}".format(args.index))
+
+        exit(0)
+
+    ###########################################################################
+    # Query
+    ###########################################################################
+
+    index = load_depth_increase_index(args.index)
+
+    print("Reading index from the file:  {}".format(args.index))
+    print("Number of values to consider: {}".format(index.getNumber()))
+    print("Total number of depth values: {}".format(index.getDepthValueCount()))
+    print("Number of depth increases is: {}".format(index.getIncreaseCount()))
+
+    for first, last in args.range:
+        print("Depth increases from {} to {}: {}".format(first, last, index.countIncreases(first, last)))
+
+    for k in args.select:
+        print("Depth increase number {} is at: {}".format(k, index.findIncrease(k)))
+
+    exit(0)
+
+
+if __name__ == "__main__":
+    main()
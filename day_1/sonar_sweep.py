@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+
+import bz2
+import csv
+import gzip
+import json
+import lzma
+import os
+import struct
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+from contextlib import nullcontext
+from itertools import islice
+from operator import lt
+
+# NumPy is only needed for the binary depth value format
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of bytes to read at a time when streaming depth values
+CHUNK_SIZE = 1024 * 1024
+
+# First bytes of compressed depth value files
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+BZ2_MAGIC = b"BZh"
+
+# Binary depth value format. Fixed-width little endian 32-bit integers.
+BINARY_DTYPE = "<i4"
+
+# Number of values to compare at a time when counting binary depth values
+BINARY_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Binary window statistics record. Sum, mean, min and max of one window.
+WINDOW_STATISTICS_RECORD = struct.Struct("<qdqq")
+
+
+def count_depth_increases(depth_values, number=3):
+    """ Count how many times the sum of a sliding window of depth values
+        increases from the previous window's sum.
+
+        Two neighbouring windows share all but one value. The first window
+        drops depth_values[index] and the second window picks up
+        depth_values[index+number], so comparing those two values is the same
+        as comparing the two window sums. This makes the count O(n) no matter
+        how wide the window is.
+
+        Input:  depth values [ depth value <int> ]
+                number of values in a window <int>
+
+        Output: number of depth increases <int>
+    """
+    # Compare each value with the value "number" positions after it
+    return sum(map(lt, depth_values, islice(depth_values, number, None)))
+
+
+def detect_compression(FILE):
+    """ Detect the compression of the given binary file from its first few
+        bytes. Nothing is consumed from the file.
+
+        Input:  open binary file (must support peek()) <file>
+
+        Output: compression module (gzip, lzma or bz2), None if not compressed
+    """
+    magic = FILE.peek(len(XZ_MAGIC))
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip
+    elif magic.startswith(XZ_MAGIC):
+        return lzma
+    elif magic.startswith(BZ2_MAGIC):
+        return bz2
+
+    return None
+
+
+def is_compressed_depth_file(file_name):
+    """ Check if the given depth value file is compressed.
+
+        Input:  file name <str>
+
+        Output: is compressed <bool>
+    """
+    with open(file_name, 'rb') as FILE:
+        return detect_compression(FILE) is not None
+
+
+def open_depth_file(file_name):
+    """ Open the given depth value file for reading in binary mode. A file
+        name of "-" reads from stdin instead. Gzip, xz and bzip2 compressed
+        input is detected and decompressed as it is read. Nothing is written
+        to disk.
+
+        Input:  file name <str>
+
+        Output: open file <file>
+    """
+    # Read from stdin. Don't let the caller close stdin.
+    if file_name == "-":
+        compression = detect_compression(sys.stdin.buffer)
+
+        if compression is None:
+            return nullcontext(sys.stdin.buffer)
+
+        # Closing the decompressor leaves stdin open
+        return compression.open(sys.stdin.buffer, 'rb')
+
+    FILE = open(file_name, 'rb')
+    compression = detect_compression(FILE)
+
+    if compression is None:
+        return FILE
+
+    # Let the decompressor open (and close) the file itself
+    FILE.close()
+
+    return compression.open(file_name, 'rb')
+
+
+def read_depth_values(FILE, chunk_size=CHUNK_SIZE, size=-1):
+    """ Read depth values from the given binary file one buffered chunk at a
+        time. One value per line. Blank lines are skipped. Only one chunk is
+        ever held in memory.
+
+        Input:  open binary file <file>
+                bytes to read per chunk <int>
+                total bytes to read, -1 to read to the end of the file <int>
+
+        Output: depth values (generator) [ depth value <int> ]
+    """
+    # Partial line left over from the end of the previous chunk
+    remainder = b""
+
+    while size != 0:
+        chunk = FILE.read(chunk_size if size < 0 else min(chunk_size, size))
+
+        # Keep track of how many bytes are left to read
+        if size > 0:
+            size -= len(chunk)
+
+        # End of file
+        if not chunk:
+            break
+
+        # The last line might not be complete yet. Hold on to it. Parse all
+        # the complete lines at once.
+        data = remainder + chunk
+        end = data.rfind(b"\n") + 1
+        remainder = data[end:]
+
+        yield from map(int, data[:end].split())
+
+    # The file might not end with a newline
+    if remainder.strip():
+        yield int(remainder)
+
+
+def stream_depth_increases(depth_values, number=3):
+    """ Count sliding window depth increases while the depth values are read.
+        Only the last "number" values are kept (ring buffer), so memory stays
+        flat no matter how many values there are.
+
+        Input:  depth values [ depth value <int> ]
+                number of values in a window <int>
+
+        Output: number of depth values <int>
+                number of depth increases <int>
+    """
+    # The last "number" depth values. The oldest value drops off automatically.
+    window = deque(maxlen=number)
+
+    depth_value_count = 0
+    depth_increase_count = 0
+
+    for depth_value in depth_values:
+        # The value leaving the window is compared with the value entering it
+        if len(window) == number and window[0] < depth_value:
+            depth_increase_count += 1
+
+        window.append(depth_value)
+        depth_value_count += 1
+
+    return depth_value_count, depth_increase_count
+
+
+def require_numpy():
+    """ Make sure NumPy is available. The binary depth value format needs it.
+
+        Input:  None
+
+        Output: None
+    """
+    if numpy is None:
+        raise ImportError("NumPy is required to read and write binary depth value files.")
+
+
+def write_depth_values_binary(depth_values, FILE, block_size=BINARY_BLOCK_SIZE):
+    """ Write the given depth values to the given binary file as fixed-width
+        32-bit integers. The values are written one block at a time.
+
+        Input:  depth values [ depth value <int> ]
+                open binary file <file>
+                number of values to write at a time <int>
+
+        Output: number of depth values written <int>
+    """
+    require_numpy()
+
+    depth_values = iter(depth_values)
+    depth_value_count = 0
+
+    while True:
+        block = numpy.fromiter(islice(depth_values, block_size), dtype=BINARY_DTYPE)
+
+        # No values left
+        if len(block) == 0:
+            break
+
+        FILE.write(block.tobytes())
+        depth_value_count += len(block)
+
+    return depth_value_count
+
+
+def load_depth_values_binary(file_name):
+    """ Memory map the given binary depth value file. Nothing is parsed; the
+        values are read straight from the file as they are used.
+
+        Input:  file name <str>
+
+        Output: depth values <numpy.ndarray>
+    """
+    require_numpy()
+
+    # An empty file can't be memory mapped
+    if os.path.getsize(file_name) == 0:
+        return numpy.empty(0, dtype=BINARY_DTYPE)
+
+    return numpy.memmap(file_name, dtype=BINARY_DTYPE, mode='r')
+
+
+def iter_depth_values_binary(depth_values, block_size=BINARY_BLOCK_SIZE):
+    """ Read memory mapped depth values one block at a time. Only one block is
+        converted to Python integers at a time, so the binary values can feed
+        the streaming engines in constant memory.
+
+        Input:  depth values <numpy.ndarray>
+                number of values to read at a time <int>
+
+        Output: depth values (generator) [ depth value <int> ]
+    """
+    for start in range(0, len(depth_values), block_size):
+        yield from depth_values[start:start+block_size].tolist()
+
+
+def count_depth_increases_vectorized(depth_values, number=3, block_size=BINARY_BLOCK_SIZE):
+    """ Count sliding window depth increases with vectorized NumPy comparisons.
+        Uses the same lag comparison as count_depth_increases(). The values are
+        compared one block at a time to keep the temporary arrays small.
+
+        Input:  depth values <numpy.ndarray>
+                number of values in a window <int>
+                number of comparisons per block <int>
+
+        Output: number of depth increases <int>
+    """
+    require_numpy()
+
+    # Number of window comparisons
+    comparison_count = max(len(depth_values) - number, 0)
+
+    depth_increase_count = 0
+
+    for start in range(0, comparison_count, block_size):
+        stop = min(start + block_size, comparison_count)
+        depth_increase_count += int(numpy.count_nonzero(depth_values[start:stop] < depth_values[start+number:stop+number]))
+
+    return depth_increase_count
+
+
+def parse_window_sizes(text):
+    """ Parse a list of window sizes. Sizes are separated by commas. A range
+        of sizes is given as "first-last" (inclusive). For example, "1,3,10-20".
+
+        Input:  window sizes <str>
+
+        Output: sorted window sizes [ window size <int> ]
+    """
+    window_sizes = set()
+
+    for part in text.split(","):
+        # Range of window sizes
+        if "-" in part:
+            first, last = map(int, part.split("-"))
+            window_sizes.update(range(first, last + 1))
+        # Single window size
+        else:
+            window_sizes.add(int(part))
+
+    # Need at least one value in a window
+    if len(window_sizes) == 0 or min(window_sizes) < 1:
+        raise ValueError("Window sizes must be positive integers: {}".format(text))
+
+    return sorted(window_sizes)
+
+
+def sweep_window_sizes(depth_values, window_sizes):
+    """ Count the depth increases for each of the given window sizes. The depth
+        values are shared by every window size. They are only converted to a
+        NumPy array once, when NumPy is available.
+
+        Input:  depth values [ depth value <int> ]
+                window sizes [ window size <int> ]
+
+        Output: depth increases for each window size { window size <int>: number of depth increases <int> }
+    """
+    # Use vectorized comparisons when NumPy is available
+    if numpy is not None:
+        depth_values = numpy.asarray(depth_values)
+        count = count_depth_increases_vectorized
+    else:
+        count = count_depth_increases
+
+    return {window_size: count(depth_values, window_size) for window_size in window_sizes}
+
+
+def summarize_depth_values(depth_values, number=3):
+    """ Count sliding window depth increases in a chunk of depth values. The
+        first and last "number" values of the chunk are kept so increases that
+        cross into the next chunk can be counted when chunks are merged.
+
+        Input:  depth values [ depth value <int> ]
+                number of values in a window <int>
+
+        Output: chunk summary (number of depth values <int>,
+                               number of depth increases <int>,
+                               first values [ depth value <int> ],
+                               last values [ depth value <int> ])
+    """
+    depth_values = iter(depth_values)
+
+    # The first "number" depth values
+    head = list(islice(depth_values, number))
+
+    # The last "number" depth values
+    tail = deque(head, maxlen=number)
+
+    depth_value_count = len(head)
+    depth_increase_count = 0
+
+    for depth_value in depth_values:
+        # The value leaving the window is compared with the value entering it
+        if tail[0] < depth_value:
+            depth_increase_count += 1
+
+        tail.append(depth_value)
+        depth_value_count += 1
+
+    return depth_value_count, depth_increase_count, head, list(tail)
+
+
+def merge_depth_summaries(summary1, summary2, number=3):
+    """ Merge the summaries of two neighbouring chunks of depth values. The
+        first chunk comes right before the second chunk.
+
+        Input:  first chunk summary (see summarize_depth_values())
+                second chunk summary (see summarize_depth_values())
+                number of values in a window <int>
+
+        Output: merged chunk summary (see summarize_depth_values())
+    """
+    depth_value_count1, depth_increase_count1, head1, tail1 = summary1
+    depth_value_count2, depth_increase_count2, head2, tail2 = summary2
+
+    # Windows that cross the chunk boundary compare a value near the end of
+    # the first chunk with a value near the start of the second chunk
+    boundary = tail1 + head2
+    crossing_count = sum(boundary[index] < boundary[index+number] for index in range(max(len(tail1) - number, 0), min(len(tail1), len(boundary) - number)))
+
+    return (depth_value_count1 + depth_value_count2,
+            depth_increase_count1 + depth_increase_count2 + crossing_count,
+            (head1 + head2)[:number],
+            (tail1 + tail2)[-number:])
+
+
+def find_line_boundaries(file_name, chunk_count):
+    """ Split the given file into byte ranges. Each range starts at the
+        beginning of a line and ends at the end of a line.
+
+        Input:  file name <str>
+                number of chunks <int>
+
+        Output: byte ranges [ (start <int>, stop <int>) ]
+    """
+    file_size = os.path.getsize(file_name)
+
+    # Chunk boundaries. Move each one forward to the start of the next line.
+    boundaries = [0]
+
+    with open(file_name, 'rb') as FILE:
+        for chunk in range(1, chunk_count):
+            FILE.seek(max(file_size * chunk // chunk_count, boundaries[-1]))
+            FILE.readline()
+            boundaries.append(min(FILE.tell(), file_size))
+
+    boundaries.append(file_size)
+
+    # Skip empty ranges
+    return [(start, stop) for start, stop in zip(boundaries, boundaries[1:]) if start < stop]
+
+
+def summarize_depth_file_range(file_name, start, stop, number=3):
+    """ Summarize the depth values found in the given byte range of a file.
+        Runs in a worker process.
+
+        Input:  file name <str>
+                first byte <int>
+                byte after the last byte <int>
+                number of values in a window <int>
+
+        Output: chunk summary (see summarize_depth_values())
+    """
+    with open(file_name, 'rb') as FILE:
+        FILE.seek(start)
+        return summarize_depth_values(read_depth_values(FILE, size=stop - start), number)
+
+
+def count_depth_file_parallel(file_name, number=3, processes=None):
+    """ Count sliding window depth increases in the given file with a pool of
+        processes. The file is split into one chunk per process. Each chunk is
+        summarized on its own, then the summaries are merged in order.
+
+        Input:  file name <str>
+                number of values in a window <int>
+                number of processes, None for one per CPU <int>
+
+        Output: number of depth values <int>
+                number of depth increases <int>
+    """
+    # Byte offsets in a compressed file don't line up with lines
+    if is_compressed_depth_file(file_name):
+        raise ValueError("Compressed depth file {} can't be split into chunks.".format(file_name))
+
+    # One process per CPU by default
+    processes = processes or os.cpu_count()
+
+    ranges = find_line_boundaries(file_name, processes)
+
+    with Pool(processes) as pool:
+        summaries = pool.starmap(summarize_depth_file_range, [(file_name, start, stop, number) for start, stop in ranges])
+
+    # Merge the chunk summaries in file order
+    summary = (0, 0, [], [])
+    for chunk_summary in summaries:
+        summary = merge_depth_summaries(summary, chunk_summary, number)
+
+    return summary[0], summary[1]
+
+
+class DepthIncreaseTracker(object):
+    """ Keeps running single value and sliding window depth increase counts
+        for a depth file that keeps growing. Only the last "number" values and
+        the byte offset of the next unread line are kept, so the counts can be
+        updated as new lines arrive and saved to a checkpoint.
+
+        Input:  number of values in a window <int>
+    """
+    def __init__(self, number=3):
+        # Number of values in a window
+        self.__number = number
+
+        # Byte offset in the depth file of the next line to read
+        self.__offset = 0
+
+        # Number of depth values read so far
+        self.__depth_value_count = 0
+
+        # Single value and sliding window depth increases counted so far
+        self.__depth_increase_count = 0
+        self.__window_increase_count = 0
+
+        # The last "number" depth values
+        self.__window = deque(maxlen=number)
+
+    def addLines(self, data):
+        """ Add the depth values from the given complete lines of the depth
+            file. Blank lines are skipped.
+
+            Input:  complete lines <bytes>
+
+            Output: None
+        """
+        for line in data.split(b"\n"):
+            if line.strip():
+                self.addValue(int(line))
+
+        # Move past the lines that were just read
+        self.__offset += len(data)
+
+    def addValue(self, depth_value):
+        """ Add the next depth value and update the depth increase counts.
+
+            Input:  depth value <int>
+
+            Output: None
+        """
+        # Single value increase. Compare with the previous value.
+        if len(self.__window) > 0 and self.__window[-1] < depth_value:
+            self.__depth_increase_count += 1
+
+        # Sliding window increase. Compare with the value leaving the window.
+        if len(self.__window) == self.__number and self.__window[0] < depth_value:
+            self.__window_increase_count += 1
+
+        self.__window.append(depth_value)
+        self.__depth_value_count += 1
+
+    def getDepthIncreaseCount(self):
+        """ Get the number of single value depth increases.
+
+            Input:  None
+
+            Output: number of depth increases <int>
+        """
+        return self.__depth_increase_count
+
+    def getDepthValueCount(self):
+        """ Get the number of depth values read so far.
+
+            Input:  None
+
+            Output: number of depth values <int>
+        """
+        return self.__depth_value_count
+
+    def getOffset(self):
+        """ Get the byte offset of the next line to read from the depth file.
+
+            Input:  None
+
+            Output: byte offset <int>
+        """
+        return self.__offset
+
+    def getWindowIncreaseCount(self):
+        """ Get the number of sliding window depth increases.
+
+            Input:  None
+
+            Output: number of depth increases <int>
+        """
+        return self.__window_increase_count
+
+    def loadCheckpoint(self, file_name):
+        """ Restore the tracker's state from the given checkpoint file. The
+            checkpoint must have been saved with the same window size.
+
+            Input:  checkpoint file name <str>
+
+            Output: None
+        """
+        with open(file_name, 'r') as FILE:
+            checkpoint = json.load(FILE)
+
+        if checkpoint["number"] != self.__number:
+            raise ValueError("Checkpoint window size {} does not match {}.".format(checkpoint["number"], self.__number))
+
+        self.__offset = checkpoint["offset"]
+        self.__depth_value_count = checkpoint["depth_value_count"]
+        self.__depth_increase_count = checkpoint["depth_increase_count"]
+        self.__window_increase_count = checkpoint["window_increase_count"]
+        self.__window = deque(checkpoint["window"], maxlen=self.__number)
+
+    def saveCheckpoint(self, file_name):
+        """ Save the tracker's state to the given checkpoint file. The file is
+            replaced in one step so a crash never leaves half a checkpoint.
+
+            Input:  checkpoint file name <str>
+
+            Output: None
+        """
+        checkpoint = {
+            "number": self.__number,
+            "offset": self.__offset,
+            "depth_value_count": self.__depth_value_count,
+            "depth_increase_count": self.__depth_increase_count,
+            "window_increase_count": self.__window_increase_count,
+            "window": list(self.__window),
+        }
+
+        with open(file_name + ".tmp", 'w') as FILE:
+            json.dump(checkpoint, FILE)
+
+        os.replace(file_name + ".tmp", file_name)
+
+
+def follow_depth_file(file_name, tracker, interval=1.0, chunk_size=CHUNK_SIZE):
+    """ Follow a depth file that keeps growing. Read any complete lines after
+        the tracker's offset, then wait for more. A partial last line is left
+        for the next read. Never returns.
+
+        Input:  file name <str>
+                depth increase tracker <DepthIncreaseTracker>
+                seconds to wait between reads <float>
+                bytes to read per chunk <int>
+
+        Output: the tracker every time new values were read (generator) <DepthIncreaseTracker>
+    """
+    # Byte offsets in a compressed file don't line up with lines
+    if is_compressed_depth_file(file_name):
+        raise ValueError("Compressed depth file {} can't be followed.".format(file_name))
+
+    while True:
+        # The file was truncated or replaced. The checkpoint no longer matches.
+        if os.path.getsize(file_name) < tracker.getOffset():
+            raise ValueError("Depth file {} is smaller than the checkpoint offset {}.".format(file_name, tracker.getOffset()))
+
+        depth_value_count = tracker.getDepthValueCount()
+
+        with open(file_name, 'rb') as FILE:
+            FILE.seek(tracker.getOffset())
+
+            # Partial line left over from the end of the previous chunk
+            remainder = b""
+
+            while True:
+                chunk = FILE.read(chunk_size)
+
+                # End of file (for now)
+                if not chunk:
+                    break
+
+                # Only read up to the end of the last complete line
+                data = remainder + chunk
+                end = data.rfind(b"\n") + 1
+
+                tracker.addLines(data[:end])
+                remainder = data[end:]
+
+        # Report only when there was something new
+        if tracker.getDepthValueCount() != depth_value_count:
+            yield tracker
+
+        time.sleep(interval)
+
+
+def moving_window_statistics(depth_values, number=3):
+    """ Calculate the sum, mean, min and max of every sliding window of depth
+        values in a single pass. The sum is kept as a running sum. The min and
+        max are kept with monotonic deques, so every value is added and removed
+        at most once.
+
+        Input:  depth values [ depth value <int> ]
+                number of values in a window <int>
+
+        Output: window statistics (generator) [ (sum <int>, mean <float>, min <int>, max <int>) ]
+    """
+    # The values in the current window (needed to update the running sum)
+    window = deque(maxlen=number)
+    window_sum = 0
+
+    # Indexes and values of window min and max candidates. Values increase
+    # from front to back in the min deque and decrease in the max deque. The
+    # front of each deque is the window's min or max.
+    minimums = deque()
+    maximums = deque()
+
+    for index, depth_value in enumerate(depth_values):
+        # Drop the value leaving the window
+        if len(window) == number:
+            window_sum -= window[0]
+
+        window.append(depth_value)
+        window_sum += depth_value
+
+        # Values that can never be the min or max again
+        while minimums and minimums[-1][1] >= depth_value:
+            minimums.pop()
+        while maximums and maximums[-1][1] <= depth_value:
+            maximums.pop()
+
+        minimums.append((index, depth_value))
+        maximums.append((index, depth_value))
+
+        # Candidates that fell out of the window
+        if minimums[0][0] <= index - number:
+            minimums.popleft()
+        if maximums[0][0] <= index - number:
+            maximums.popleft()
+
+        # Report once the first window is full
+        if index >= number - 1:
+            yield window_sum, window_sum / number, minimums[0][1], maximums[0][1]
+
+
+def export_window_statistics(statistics, FILE, binary=False):
+    """ Write window statistics to the given file one window at a time. Text
+        output is CSV with a header. Binary output is fixed-size records (see
+        WINDOW_STATISTICS_RECORD).
+
+        Input:  window statistics [ (sum <int>, mean <float>, min <int>, max <int>) ]
+                open file, binary mode for binary output <file>
+                write binary records <bool>
+
+        Output: number of windows written <int>
+    """
+    window_count = 0
+
+    if binary:
+        for window_statistics in statistics:
+            FILE.write(WINDOW_STATISTICS_RECORD.pack(*window_statistics))
+            window_count += 1
+    else:
+        writer = csv.writer(FILE)
+        writer.writerow(["window", "sum", "mean", "min", "max"])
+
+        for window_count, window_statistics in enumerate(statistics, 1):
+            writer.writerow([window_count - 1, *window_statistics])
+
+    return window_count
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
+
+from sonar_sweep import DepthIncreaseTracker, count_depth_file_parallel, count_depth_increases, count_depth_increases_vectorized, export_window_statistics, follow_depth_file, iter_depth_values_binary, load_depth_values_binary, moving_window_statistics, open_depth_file, parse_window_sizes, read_depth_values, stream_depth_increases, sweep_window_sizes
 
 
 def main():
@@ -15,51 +18,179 @@ def main():
     description = "Read in depth values from the given file. Find and count 3-value depth increases."
 
     parser = argparse.ArgumentParser(description=description)
-    parser.add_argument("file", help="Text file with depth values. One value per line.")
+    parser.add_argument("file", help="Text file with depth values. One value per line. Use - to read stdin.")
     parser.add_argument("-n", "--number", type=int, help="Number of values to add together for comparison", default=3)
+    parser.add_argument("-s", "--stream", action="store_true", help="Stream the values in chunks using constant memory")
+    parser.add_argument("-p", "--processes", type=int, help="Count in parallel chunks with this many processes (0 for one per CPU)")
+    parser.add_argument("-f", "--follow", action="store_true", help="Keep watching the file and update the counts as new lines arrive")
+    parser.add_argument("-c", "--checkpoint", help="Checkpoint file used to resume --follow where it stopped")
+    parser.add_argument("-i", "--interval", type=float, help="Seconds to wait between checks for new lines with --follow", default=1.0)
+    parser.add_argument("-b", "--binary", action="store_true", help="File is a binary depth value file (see convert_depth_values.py)")
+    parser.add_argument("-l", "--lag", action="store_true", help="Count increases with the O(n) lag-comparison engine")
+
+    parser.add_argument("-e", "--export", help="Export each window's sum, mean, min and max to this CSV file (binary records if it ends in .bin)")
+    parser.add_argument("-w", "--windows", type=parse_window_sizes, help="Report a table of depth increases for many window sizes (e.g. 1,3,10-20)")
 
     args = parser.parse_args()
 
+    # Sweeping window sizes needs all the values in memory
+    if args.windows and (args.stream or args.processes is not None):
+        parser.error("--windows can't be used with --stream or --processes")
+
+    # The binary values are memory mapped, not split into line-aligned chunks
+    # or followed as they grow
+    if args.binary and (args.processes is not None or args.follow):
+        parser.error("--binary can't be used with --processes or --follow")
+
+    ###########################################################################
+    # Follow mode
+    ###########################################################################
+
+    # Watch the file as it grows. Only the new lines are read each time.
+    if args.follow:
+        tracker = DepthIncreaseTracker(args.number)
+
+        # Resume from the last checkpoint instead of rereading the file
+        if args.checkpoint and os.path.exists(args.checkpoint):
+            tracker.loadCheckpoint(args.checkpoint)
+
+        print("Following the file: {}".format(args.file))
+
+        try:
+            for tracker in follow_depth_file(args.file, tracker, args.interval):
+                print("Depth values: {}  Depth increases: {}  Window increases: {}".format(tracker.getDepthValueCount(),
+                                                                                           tracker.getDepthIncreaseCount(),
+                                                                                           tracker.getWindowIncreaseCount()))
+
+                if args.checkpoint:
+                    tracker.saveCheckpoint(args.checkpoint)
+        # Stop following
+        except KeyboardInterrupt:
+            pass
+
+        exit(0)
+
+    ###########################################################################
+    # Moving window statistics export
+    ###########################################################################
+
+    # Stream the values in and the statistics out. The series is never held
+    # in memory.
+    if args.export:
+        binary = args.export.endswith(".bin")
+
+        try:
+            with open(args.export, 'wb') if binary else open(args.export, 'w', newline='') as OUTPUT:
+                # Binary mode reads the memory mapped values a block at a time
+                if args.binary:
+                    depth_values = iter_depth_values_binary(load_depth_values_binary(args.file))
+                    window_count = export_window_statistics(moving_window_statistics(depth_values, args.number), OUTPUT, binary)
+                else:
+                    with open_depth_file(args.file) as FILE:
+                        window_count = export_window_statistics(moving_window_statistics(read_depth_values(FILE), args.number), OUTPUT, binary)
+        except Exception:
+            raise
+
+        print("Reading values from the file: {}".format(args.file))
+        print("Number of values to consider: {}".format(args.number))
+        print("Writing statistics to file:   {}".format(args.export))
+        print("Number of windows exported:   {}".format(window_count))
+
+        exit(0)
+
     ###########################################################################
     # Read in and convert values
     ###########################################################################
 
-    try:
-        with open(args.file, 'r') as FILE:
-            depth_values = FILE.readlines()
+    # Streaming mode. Count the increases while the values are read. Only the
+    # last few values are ever kept in memory.
+    if args.stream:
+        # Binary mode streams the memory mapped values a block at a time
+        if args.binary:
+            depth_value_count, depth_increase_count = stream_depth_increases(iter_depth_values_binary(load_depth_values_binary(args.file)), args.number)
+        else:
+            with open_depth_file(args.file) as FILE:
+                depth_value_count, depth_increase_count = stream_depth_increases(read_depth_values(FILE), args.number)
+    # Parallel mode. Each process counts the increases in its own chunk of
+    # the file. The chunk results are merged afterwards.
+    elif args.processes is not None:
+        depth_value_count, depth_increase_count = count_depth_file_parallel(args.file, args.number, args.processes)
+    # Binary mode. Memory map the 32-bit integers. There is nothing to parse.
+    elif args.binary:
+        depth_values = load_depth_values_binary(args.file)
+        depth_value_count = len(depth_values)
+    else:
+        try:
+            with open_depth_file(args.file) as FILE:
+                # Convert values to integers. Compressed files are decompressed
+                # as they are read.
+                depth_values = list(read_depth_values(FILE))
+        except Exception:
+            raise
+
+        depth_value_count = len(depth_values)
+
+    ###########################################################################
+    # Multi-window sweep report
+    ###########################################################################
 
-            # Convert values to integers
-            depth_values = list(map(int, depth_values))
-    except Exception:
-        raise
+    if args.windows:
+        depth_increase_counts = sweep_window_sizes(depth_values, args.windows)
+
+        print("Reading values from the file: {}".format(args.file))
+        print("Total number of depth values: {}".format(depth_value_count))
+        print()
+        print("Window Size  Depth Increases")
+        print("-----------  ---------------")
+
+        for window_size, depth_increase_count in depth_increase_counts.items():
+            # Not enough values for even one comparison of this window size
+            if depth_value_count < window_size + 1:
+                print("{:>11}  {:>15}".format(window_size, "N/A"))
+            else:
+                print("{:>11}  {:>15}".format(window_size, depth_increase_count))
+
+        exit(0)
 
     ###########################################################################
     # Determine number of depth increases
     ###########################################################################
 
     # Check if there are enough values to calculate at least one depth increase
-    if len(depth_values) < args.number + 1:
+    if depth_value_count < args.number + 1:
         print("Not enough depth values to check for increases in depth.")
         exit(1)
 
-    # Number of times the depth increased
-    depth_increase_count = 0
-
-    # Check each value. Compare 2 values at a time. If the current value is
-    # less than the next value, that's an increase. Count it.
-    for index in range(0, len(depth_values) - args.number):
-        # The two values to compare are summations of depth values. The number
-        # values in the summation was given at the command line (-n). Default
-        # is 3 values per summation.
-        depth_values_summary1 = sum(depth_values[index:index+args.number])
-        depth_values_summary2 = sum(depth_values[index+1:index+1+args.number])
-
-        # Check if the values increase
-        does_depth_increase = depth_values_summary1 < depth_values_summary2
-
-        # Increment count when depth increases
-        if does_depth_increase:
-            depth_increase_count += 1
+    # Streaming and parallel modes already counted the depth increases while
+    # reading
+    if args.stream or args.processes is not None:
+        pass
+    # Binary mode compares all the values at once with NumPy
+    elif args.binary:
+        depth_increase_count = count_depth_increases_vectorized(depth_values, args.number)
+    # Lag-comparison engine. Neighbouring windows share all but one value, so
+    # only the values entering and leaving the window need to be compared.
+    elif args.lag:
+        depth_increase_count = count_depth_increases(depth_values, args.number)
+    else:
+        # Number of times the depth increased
+        depth_increase_count = 0
+
+        # Check each value. Compare 2 values at a time. If the current value is
+        # less than the next value, that's an increase. Count it.
+        for index in range(0, len(depth_values) - args.number):
+            # The two values to compare are summations of depth values. The number
+            # values in the summation was given at the command line (-n). Default
+            # is 3 values per summation.
+            depth_values_summary1 = sum(depth_values[index:index+args.number])
+            depth_values_summary2 = sum(depth_values[index+1:index+1+args.number])
+
+            # Check if the values increase
+            does_depth_increase = depth_values_summary1 < depth_values_summary2
+
+            # Increment count when depth increases
+            if does_depth_increase:
+                depth_increase_count += 1
 
     ###########################################################################
     # Report
@@ -67,7 +198,7 @@ def main():
 
     print("Reading values from the file: {}".format(args.file))
     print("Number of values to consider: {}".format(args.number))
-    print("Total number of depth values: {}".format(len(depth_values)))
+    print("Total number of depth values: {}".format(depth_value_count))
     print("Number of depth increases is: {}".format(depth_increase_count))
 
     exit(0)
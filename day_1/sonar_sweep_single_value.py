@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
+
+from sonar_sweep import DepthIncreaseTracker, count_depth_file_parallel, count_depth_increases_vectorized, follow_depth_file, iter_depth_values_binary, load_depth_values_binary, open_depth_file, read_depth_values, stream_depth_increases
 
 
 def main():
@@ -15,55 +18,119 @@ def main():
     description = "Read in depth values from the given file. Find and count single value depth increases."
 
     parser = argparse.ArgumentParser(description=description)
-    parser.add_argument("file", help="Text file with depth values. One value per line.")
+    parser.add_argument("file", help="Text file with depth values. One value per line. Use - to read stdin.")
+    parser.add_argument("-s", "--stream", action="store_true", help="Stream the values in chunks using constant memory")
+    parser.add_argument("-p", "--processes", type=int, help="Count in parallel chunks with this many processes (0 for one per CPU)")
+    parser.add_argument("-f", "--follow", action="store_true", help="Keep watching the file and update the counts as new lines arrive")
+    parser.add_argument("-c", "--checkpoint", help="Checkpoint file used to resume --follow where it stopped")
+    parser.add_argument("-i", "--interval", type=float, help="Seconds to wait between checks for new lines with --follow", default=1.0)
+    parser.add_argument("-b", "--binary", action="store_true", help="File is a binary depth value file (see convert_depth_values.py)")
 
     args = parser.parse_args()
 
+    # The binary values are memory mapped, not split into line-aligned chunks
+    # or followed as they grow
+    if args.binary and (args.processes is not None or args.follow):
+        parser.error("--binary can't be used with --processes or --follow")
+
     ###########################################################################
-    # Read in and convert values
+    # Follow mode
     ###########################################################################
 
-    try:
-        with open(args.file, 'r') as FILE:
-            depth_values = FILE.readlines()
+    # Watch the file as it grows. Only the new lines are read each time.
+    if args.follow:
+        tracker = DepthIncreaseTracker(1)
+
+        # Resume from the last checkpoint instead of rereading the file
+        if args.checkpoint and os.path.exists(args.checkpoint):
+            tracker.loadCheckpoint(args.checkpoint)
 
-            # Convert values to integers
-            depth_values = list(map(int, depth_values))
-    except Exception:
-        raise
+        print("Following the file: {}".format(args.file))
+
+        try:
+            for tracker in follow_depth_file(args.file, tracker, args.interval):
+                print("Depth values: {}  Depth increases: {}".format(tracker.getDepthValueCount(), tracker.getDepthIncreaseCount()))
+
+                if args.checkpoint:
+                    tracker.saveCheckpoint(args.checkpoint)
+        # Stop following
+        except KeyboardInterrupt:
+            pass
+
+        exit(0)
+
+    ###########################################################################
+    # Read in and convert values
+    ###########################################################################
+
+    # Streaming mode. Count the increases while the values are read. Only the
+    # last few values are ever kept in memory.
+    if args.stream:
+        # Binary mode streams the memory mapped values a block at a time
+        if args.binary:
+            depth_value_count, depth_increase_count = stream_depth_increases(iter_depth_values_binary(load_depth_values_binary(args.file)), 1)
+        else:
+            with open_depth_file(args.file) as FILE:
+                depth_value_count, depth_increase_count = stream_depth_increases(read_depth_values(FILE), 1)
+    # Parallel mode. Each process counts the increases in its own chunk of
+    # the file. The chunk results are merged afterwards.
+    elif args.processes is not None:
+        depth_value_count, depth_increase_count = count_depth_file_parallel(args.file, 1, args.processes)
+    # Binary mode. Memory map the 32-bit integers. There is nothing to parse.
+    elif args.binary:
+        depth_values = load_depth_values_binary(args.file)
+        depth_value_count = len(depth_values)
+    else:
+        try:
+            with open_depth_file(args.file) as FILE:
+                # Convert values to integers. Compressed files are decompressed
+                # as they are read.
+                depth_values = list(read_depth_values(FILE))
+        except Exception:
+            raise
+
+        depth_value_count = len(depth_values)
 
     ###########################################################################
     # Determine number of depth increases
     ###########################################################################
 
     # Check if there are enough values to calculate at least one depth increase
-    if len(depth_values) < 2:
+    if depth_value_count < 2:
         print("Not enough depth values to check for increases in depth.")
         exit(1)
 
-    # Number of times the depth increased
-    depth_increase_count = 0
-
-    # Check each value. Compare 2 values at a time. If the current value is
-    # less than the next value, that's an increase. Count it.
-    for index in range(0, len(depth_values)-1):
-        # The current and next depth values
-        depth_value1 = depth_values[index]
-        depth_value2 = depth_values[index+1]
-
-        # Check if the values increase
-        does_depth_increase = depth_value1 < depth_value2
-
-        # Increment count when depth increases
-        if does_depth_increase:
-            depth_increase_count += 1
+    # Streaming and parallel modes already counted the depth increases while
+    # reading
+    if args.stream or args.processes is not None:
+        pass
+    # Binary mode compares all the values at once with NumPy
+    elif args.binary:
+        depth_increase_count = count_depth_increases_vectorized(depth_values, 1)
+    else:
+        # Number of times the depth increased
+        depth_increase_count = 0
+
+        # Check each value. Compare 2 values at a time. If the current value is
+        # less than the next value, that's an increase. Count it.
+        for index in range(0, len(depth_values)-1):
+            # The current and next depth values
+            depth_value1 = depth_values[index]
+            depth_value2 = depth_values[index+1]
+
+            # Check if the values increase
+            does_depth_increase = depth_value1 < depth_value2
+
+            # Increment count when depth increases
+            if does_depth_increase:
+                depth_increase_count += 1
 
     ###########################################################################
     # Report
     ###########################################################################
 
     print("Reading values from the file: {}".format(args.file))
-    print("Total number of depth values: {}".format(len(depth_values)))
+    print("Total number of depth values: {}".format(depth_value_count))
     print("Number of depth increases is: {}".format(depth_increase_count))
 
     exit(0)
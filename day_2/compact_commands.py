@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+
+from pilot_commands import compact_commands, find_unrecognized_commands, save_compacted_commands, tokenize_commands
+
+
+def main():
+    """ Read in the piloting instructions provided by the given file. Merge
+        each run of the same command into one (command, total, count) record
+        and write the runs to a compact binary file. The pilot scripts can
+        replay the compacted file (--compacted) directly.
+    """
+    ###########################################################################
+    # Command line argument parser
+    ###########################################################################
+
+    description = "Compact a file of piloting commands by merging runs of the same command."
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("file", help="Text file with piloting commands. One command per line.")
+    parser.add_argument("output", help="Compacted command file to write.")
+
+    args = parser.parse_args()
+
+    ###########################################################################
+    # Read in directions
+    ###########################################################################
+
+    try:
+        with open(args.file, 'rb') as FILE:
+            data = FILE.read()
+    except Exception:
+        raise
+
+    opcodes, values = tokenize_commands(data)
+
+    # Unknown commands are kept (as their own runs) but never move the submarine
+    for command_number, command_word in find_unrecognized_commands(opcodes, data):
+        print("ERROR: Unrecognized command number {}: {}".format(command_number, command_word))
+
+    ###########################################################################
+    # Compact commands
+    ###########################################################################
+
+    run_opcodes, run_totals, run_counts = compact_commands(opcodes, values)
+
+    save_compacted_commands(args.output, run_opcodes, run_totals, run_counts)
+
+    ###########################################################################
+    # Report
+    ###########################################################################
+
+    print("Number of commands:  {}".format(len(opcodes)))
+    print("Number of runs:      {}".format(len(run_opcodes)))
+    print("Original size:       {}".format(os.path.getsize(args.file)))
+    print("Compacted size:      {}".format(os.path.getsize(args.output)))
+
+    exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,923 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import struct
+from array import array
+from multiprocessing import Pool
+from operator import itemgetter
+
+# NumPy is only needed for the vectorized engine
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Command opcodes
+FORWARD = 0
+DOWN = 1
+UP = 2
+INVALID = 3
+
+# Number of bytes to read at a time when streaming commands
+CHUNK_SIZE = 1024 * 1024
+
+# Piloting models
+BASIC = 0
+AIMING = 1
+
+# Compacted command file header. Magic, number of commands, number of runs,
+# bytes per run total, bytes per run count.
+COMPACTED_HEADER = struct.Struct("<4sQQBB")
+COMPACTED_MAGIC = b"PRLE"
+
+# Trajectory file header. Magic, piloting model, number of commands.
+TRAJECTORY_HEADER = struct.Struct("<4sBQ")
+TRAJECTORY_MAGIC = b"TRAJ"
+
+# Opcode of each command, looked up by the first byte of the command. Upper
+# and lower case are both accepted.
+OPCODES = {ord("f"): FORWARD, ord("F"): FORWARD,
+           ord("d"): DOWN, ord("D"): DOWN,
+           ord("u"): UP, ord("U"): UP}
+
+# Translation table from a command's first byte to its opcode
+OPCODE_TABLE = bytes(OPCODES.get(byte, INVALID) for byte in range(256))
+
+
+def require_numpy():
+    """ Make sure NumPy is available. The vectorized engine needs it.
+
+        Input:  None
+
+        Output: None
+    """
+    if numpy is None:
+        raise ImportError("NumPy is required for the vectorized pilot engine.")
+
+
+def tokenize_commands(data):
+    """ Tokenize piloting commands. Each line is a command word followed by an
+        integer. Commands are recognized by their first byte and the values
+        are converted all at once. Blank lines are skipped.
+
+        Input:  contents of the command file <bytes>
+
+        Output: opcodes <bytes>
+                values array('q')
+    """
+    tokens = data.split()
+
+    if len(tokens) % 2 != 0:
+        raise ValueError("Every command must have exactly one command word and one value.")
+
+    # First byte of every command word, translated to its opcode
+    opcodes = bytes(map(itemgetter(0), tokens[0::2])).translate(OPCODE_TABLE)
+    values = array('q', map(int, tokens[1::2]))
+
+    return opcodes, values
+
+
+def find_unrecognized_commands(opcodes, data):
+    """ Find the commands that were not recognized. Commands are numbered from
+        1. Blank lines are not commands, so a command number is not always a
+        line number.
+
+        Input:  opcodes <bytes> or <numpy.ndarray>
+                the commands the opcodes were tokenized from <bytes>
+
+        Output: unrecognized commands [ (command number <int>, command word <str>) ]
+    """
+    # Vectorized opcodes
+    if numpy is not None and isinstance(opcodes, numpy.ndarray):
+        command_numbers = (numpy.flatnonzero(opcodes == INVALID) + 1).tolist()
+    # Nothing to look for
+    elif opcodes.count(INVALID) == 0:
+        command_numbers = []
+    else:
+        command_numbers = [command_number for command_number, opcode in enumerate(opcodes, 1) if opcode == INVALID]
+
+    if not command_numbers:
+        return []
+
+    # The command words are only split out when there's something to report
+    command_words = data.split()[0::2]
+
+    return [(command_number, command_words[command_number - 1].decode(errors="replace")) for command_number in command_numbers]
+
+
+def pilot(opcodes, values):
+    """ Calculate the final position of the submarine. Forward moves
+        horizontally. Down and up change the depth. Unrecognized commands are
+        skipped.
+
+        Input:  opcodes <bytes>
+                values array('q')
+
+        Output: horizontal position <int>
+                depth position <int>
+    """
+    horizontal_position = 0
+    depth_position = 0
+
+    for opcode, value in zip(opcodes, values):
+        # Horizontal forward
+        if opcode == FORWARD:
+            horizontal_position += value
+        # Depth down
+        elif opcode == DOWN:
+            depth_position += value
+        # Depth up
+        elif opcode == UP:
+            depth_position -= value
+
+    return horizontal_position, depth_position
+
+
+def pilot_by_aiming(opcodes, values):
+    """ Calculate the final position of the submarine with the aiming model.
+        Down and up change the aim. Forward moves horizontally and changes the
+        depth by aim * value. Unrecognized commands are skipped.
+
+        Input:  opcodes <bytes>
+                values array('q')
+
+        Output: horizontal position <int>
+                depth position <int>
+                aim <int>
+    """
+    horizontal_position = 0
+    depth_position = 0
+    aim = 0
+
+    for opcode, value in zip(opcodes, values):
+        # Horizontal forward
+        if opcode == FORWARD:
+            horizontal_position += value
+            depth_position += aim * value
+        # Depth down
+        elif opcode == DOWN:
+            aim += value
+        # Depth up
+        elif opcode == UP:
+            aim -= value
+
+    return horizontal_position, depth_position, aim
+
+
+def parse_commands_vectorized(data):
+    """ Parse piloting commands into an opcode array and a value array without
+        a Python loop. Each line is a command word followed by an integer. The
+        command is recognized by its first byte. Accepts the same input as
+        tokenize_commands(): a value is an optional sign and digits.
+
+        Input:  contents of the command file <bytes>
+
+        Output: opcodes <numpy.ndarray uint8>
+                values <numpy.ndarray int64>
+    """
+    require_numpy()
+
+    buffer = numpy.frombuffer(data, dtype=numpy.uint8)
+
+    # Opcode lookup table for every possible byte
+    opcode_table = numpy.frombuffer(OPCODE_TABLE, dtype=numpy.uint8)
+
+    # Tokens are runs of anything but whitespace, the same as bytes.split().
+    # They alternate between command words and values.
+    is_token = ~numpy.isin(buffer, numpy.frombuffer(b" \t\n\r\x0b\x0c", dtype=numpy.uint8))
+    edges = numpy.diff(is_token.astype(numpy.int8), prepend=0, append=0)
+    token_starts = numpy.flatnonzero(edges == 1)
+    token_ends = numpy.flatnonzero(edges == -1)
+
+    if len(token_starts) % 2 != 0:
+        raise ValueError("Every command must have exactly one command word and one value.")
+
+    opcodes = opcode_table[buffer[token_starts[0::2]]]
+
+    value_starts = token_starts[1::2]
+    value_ends = token_ends[1::2]
+
+    # An optional sign before the digits
+    first_bytes = buffer[value_starts]
+    negative = first_bytes == ord("-")
+    digit_starts = value_starts + (negative | (first_bytes == ord("+")))
+    lengths = value_ends - digit_starts
+
+    # Every value needs digits, few enough to fit in 64 bits
+    if len(lengths) and (lengths.min() < 1 or lengths.max() > 18):
+        raise ValueError("Every command value must be an integer.")
+
+    # Mark the digits of every value. Everything marked must be a digit.
+    marks = numpy.zeros(len(buffer) + 1, dtype=numpy.int32)
+    marks[digit_starts] += 1
+    marks[value_ends] -= 1
+    in_value = numpy.cumsum(marks[:-1]) > 0
+
+    is_digit = (buffer >= ord("0")) & (buffer <= ord("9"))
+    if numpy.any(in_value & ~is_digit):
+        raise ValueError("Every command value must be an integer.")
+
+    # Each digit is worth 10 ** (number of digits after it in its value)
+    digit_positions = numpy.flatnonzero(in_value)
+    digit_ends = numpy.repeat(value_ends, lengths)
+    digits = (buffer[digit_positions] - ord("0")).astype(numpy.int64)
+    digits *= 10 ** (digit_ends - digit_positions - 1)
+
+    # Add up the digits of each value
+    values = numpy.add.reduceat(digits, numpy.cumsum(lengths) - lengths) if len(lengths) else digits
+    values[negative] *= -1
+
+    return opcodes, values
+
+
+def pilot_vectorized(opcodes, values):
+    """ Calculate the final position of the submarine. Forward moves
+        horizontally. Down and up change the depth.
+
+        Input:  opcodes <numpy.ndarray>
+                values <numpy.ndarray>
+
+        Output: horizontal position <int>
+                depth position <int>
+    """
+    require_numpy()
+
+    horizontal_position = int(values[opcodes == FORWARD].sum())
+    depth_position = int(values[opcodes == DOWN].sum() - values[opcodes == UP].sum())
+
+    return horizontal_position, depth_position
+
+
+def pilot_by_aiming_vectorized(opcodes, values):
+    """ Calculate the final position of the submarine with the aiming model.
+        Down and up change the aim. Forward moves horizontally and changes the
+        depth by aim * value. The aim at every command is the running sum of
+        the down and up values.
+
+        Input:  opcodes <numpy.ndarray>
+                values <numpy.ndarray>
+
+        Output: horizontal position <int>
+                depth position <int>
+                aim <int>
+    """
+    require_numpy()
+
+    # Aim after every command
+    aim = numpy.cumsum(numpy.where(opcodes == DOWN, values, 0) - numpy.where(opcodes == UP, values, 0))
+
+    forward = opcodes == FORWARD
+
+    horizontal_position = int(values[forward].sum())
+    depth_position = int(numpy.dot(aim[forward], values[forward]))
+    final_aim = int(aim[-1]) if len(aim) else 0
+
+    return horizontal_position, depth_position, final_aim
+
+
+def compose_aiming_transforms(transform1, transform2):
+    """ Compose two aiming transforms. The first transform is applied first.
+
+        A chunk of aiming commands moves the submarine from state (horizontal,
+        depth, aim) to (horizontal + H, depth + D + aim * H, aim + A), where H,
+        D and A are what the chunk does when started from (0, 0, 0). So a
+        chunk can be summarized by the transform (H, D, A).
+
+        Input:  first transform (H <int>, D <int>, A <int>)
+                second transform (H <int>, D <int>, A <int>)
+
+        Output: composed transform (H <int>, D <int>, A <int>)
+    """
+    horizontal1, depth1, aim1 = transform1
+    horizontal2, depth2, aim2 = transform2
+
+    # The second chunk's forward commands also dive by the first chunk's aim
+    return horizontal1 + horizontal2, depth1 + depth2 + aim1 * horizontal2, aim1 + aim2
+
+
+def find_line_boundaries(file_name, chunk_count):
+    """ Split the given file into byte ranges. Each range starts at the
+        beginning of a line and ends at the end of a line.
+
+        Input:  file name <str>
+                number of chunks <int>
+
+        Output: byte ranges [ (start <int>, stop <int>) ]
+    """
+    file_size = os.path.getsize(file_name)
+
+    # Chunk boundaries. Move each one forward to the start of the next line.
+    boundaries = [0]
+
+    with open(file_name, 'rb') as FILE:
+        for chunk in range(1, chunk_count):
+            FILE.seek(max(file_size * chunk // chunk_count, boundaries[-1]))
+            FILE.readline()
+            boundaries.append(min(FILE.tell(), file_size))
+
+    boundaries.append(file_size)
+
+    # Skip empty ranges
+    return [(start, stop) for start, stop in zip(boundaries, boundaries[1:]) if start < stop]
+
+
+def aiming_transform_file_range(file_name, start, stop):
+    """ Get the aiming transform of the commands in the given byte range of a
+        file. Runs in a worker process.
+
+        Input:  file name <str>
+                first byte <int>
+                byte after the last byte <int>
+
+        Output: transform (H <int>, D <int>, A <int>)
+                number of commands <int>
+                unrecognized commands, numbered from 1 in the range [ (command number <int>, command word <str>) ]
+    """
+    with open(file_name, 'rb') as FILE:
+        FILE.seek(start)
+        data = FILE.read(stop - start)
+
+    opcodes, values = tokenize_commands(data)
+
+    # Running the chunk from (0, 0, 0) gives its transform
+    return pilot_by_aiming(opcodes, values), len(opcodes), find_unrecognized_commands(opcodes, data)
+
+
+def pilot_by_aiming_parallel(file_name, processes=None):
+    """ Run the aiming commands in the given file with a pool of processes.
+        Each process gets the aiming transform of one chunk of the file. The
+        transforms are then composed in file order.
+
+        Input:  file name <str>
+                number of processes, None for one per CPU <int>
+
+        Output: horizontal position <int>
+                depth position <int>
+                aim <int>
+                unrecognized commands [ (command number <int>, command word <str>) ]
+    """
+    # One process per CPU by default
+    processes = processes or os.cpu_count()
+
+    ranges = find_line_boundaries(file_name, processes)
+
+    with Pool(processes) as pool:
+        results = pool.starmap(aiming_transform_file_range, [(file_name, start, stop) for start, stop in ranges])
+
+    # Compose the chunk transforms in file order, starting from (0, 0, 0)
+    transform = (0, 0, 0)
+    command_count = 0
+    unrecognized_commands = []
+
+    for chunk_transform, chunk_command_count, chunk_unrecognized_commands in results:
+        transform = compose_aiming_transforms(transform, chunk_transform)
+
+        # Number the unrecognized commands from the start of the file
+        unrecognized_commands.extend((command_count + command_number, command_word) for command_number, command_word in chunk_unrecognized_commands)
+        command_count += chunk_command_count
+
+    return (*transform, unrecognized_commands)
+
+
+def compact_commands(opcodes, values):
+    """ Merge each run of the same command into one (opcode, total, count)
+        record. Replaying the runs' opcodes and totals with pilot() or
+        pilot_by_aiming() gives the same position as the original commands:
+        the aim doesn't change during a run of forward commands.
+
+        Input:  opcodes <bytes>
+                values array('q')
+
+        Output: run opcodes <bytes>
+                run totals array('q')
+                run counts array('I')
+    """
+    # Vectorized. A run starts wherever the opcode changes.
+    if numpy is not None:
+        opcode_array = numpy.frombuffer(opcodes, dtype=numpy.uint8)
+        starts = numpy.flatnonzero(numpy.concatenate(([True], opcode_array[1:] != opcode_array[:-1]))) if len(opcodes) else numpy.empty(0, dtype=numpy.int64)
+
+        run_totals = array('q', numpy.add.reduceat(numpy.frombuffer(values, dtype=numpy.int64), starts).tobytes() if len(starts) else b"")
+        run_counts = array('I', numpy.diff(starts, append=len(opcodes)).astype(numpy.uint32).tobytes())
+
+        return opcode_array[starts].tobytes(), run_totals, run_counts
+
+    run_opcodes = bytearray()
+    run_totals = array('q')
+    run_counts = array('I')
+
+    for opcode, value in zip(opcodes, values):
+        # Same command as the current run
+        if run_opcodes and run_opcodes[-1] == opcode:
+            run_totals[-1] += value
+            run_counts[-1] += 1
+        # Start a new run
+        else:
+            run_opcodes.append(opcode)
+            run_totals.append(value)
+            run_counts.append(1)
+
+    return bytes(run_opcodes), run_totals, run_counts
+
+
+def narrowest_array(values, signed=True):
+    """ Store the given integers in an array with the smallest item size that
+        fits all of them.
+
+        Input:  values [ value <int> ]
+                allow negative values <bool>
+
+        Output: array of the values <array>
+    """
+    smallest = min(values, default=0)
+    largest = max(values, default=0)
+
+    for typecode in ("bhilq" if signed else "BHILQ"):
+        bits = array(typecode).itemsize * 8
+
+        # Range of the type
+        if signed:
+            low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+        else:
+            low, high = 0, (1 << bits) - 1
+
+        if low <= smallest and largest <= high:
+            return array(typecode, values)
+
+    raise OverflowError("Values don't fit in 64 bits.")
+
+
+def typecode_for(itemsize, signed=True):
+    """ Get the array type code with the given item size.
+
+        Input:  bytes per item <int>
+                allow negative values <bool>
+
+        Output: type code <str>
+    """
+    for typecode in ("bhilq" if signed else "BHILQ"):
+        if array(typecode).itemsize == itemsize:
+            return typecode
+
+    raise ValueError("No array type with {} bytes per item.".format(itemsize))
+
+
+def load_compacted_commands(file_name):
+    """ Load a compacted command file saved with save_compacted_commands().
+
+        Input:  compacted command file name <str>
+
+        Output: run opcodes <bytes>
+                run totals <array>
+                run counts <array>
+                number of commands <int>
+    """
+    with open(file_name, 'rb') as FILE:
+        magic, command_count, run_count, total_size, count_size = COMPACTED_HEADER.unpack(FILE.read(COMPACTED_HEADER.size))
+
+        if magic != COMPACTED_MAGIC:
+            raise ValueError("Not a compacted command file: {}".format(file_name))
+
+        run_opcodes = FILE.read(run_count)
+
+        run_totals = array(typecode_for(total_size))
+        run_totals.fromfile(FILE, run_count)
+
+        run_counts = array(typecode_for(count_size, signed=False))
+        run_counts.fromfile(FILE, run_count)
+
+    return run_opcodes, run_totals, run_counts, command_count
+
+
+def save_compacted_commands(file_name, run_opcodes, run_totals, run_counts):
+    """ Save compacted commands to the given file. One opcode byte per run,
+        then the run totals and the run counts. The totals and counts are each
+        stored with the smallest integer size that fits them.
+
+        Input:  compacted command file name <str>
+                run opcodes <bytes>
+                run totals array('q')
+                run counts array('I')
+
+        Output: None
+    """
+    run_totals = narrowest_array(run_totals)
+    run_counts = narrowest_array(run_counts, signed=False)
+
+    with open(file_name, 'wb') as FILE:
+        FILE.write(COMPACTED_HEADER.pack(COMPACTED_MAGIC, sum(run_counts), len(run_opcodes), run_totals.itemsize, run_counts.itemsize))
+        FILE.write(run_opcodes)
+        run_totals.tofile(FILE)
+        run_counts.tofile(FILE)
+
+
+def read_commands(FILE, chunk_size=CHUNK_SIZE):
+    """ Read piloting commands from the given binary file (or pipe) one chunk
+        at a time. Only complete lines are returned. A partial last line is
+        kept until the rest of it arrives. Only one chunk is ever held in
+        memory.
+
+        Input:  open binary file <file>
+                bytes to read per chunk <int>
+
+        Output: chunks of complete lines (generator) [ commands <bytes> ]
+    """
+    # Return whatever is available on a pipe instead of waiting for a full chunk
+    read = getattr(FILE, "read1", FILE.read)
+
+    # Partial line left over from the end of the previous chunk
+    remainder = b""
+
+    while True:
+        chunk = read(chunk_size)
+
+        # End of file
+        if not chunk:
+            break
+
+        data = remainder + chunk
+        end = data.rfind(b"\n") + 1
+        remainder = data[end:]
+
+        yield data[:end]
+
+    # The file might not end with a newline
+    if remainder.strip():
+        yield remainder
+
+
+def stream_pilot_by_aiming(chunks, snapshot_every, state=(0, 0, 0), command_count=0, skip=0):
+    """ Run a stream of aiming commands and report a snapshot every
+        "snapshot_every" commands, plus one at the end of the stream. Each
+        chunk is tokenized and run as an aiming transform and composed with
+        the state, so only one chunk is held at a time.
+
+        Input:  chunks of complete lines [ commands <bytes> ]
+                number of commands between snapshots <int>
+                starting state (horizontal <int>, depth <int>, aim <int>)
+                number of commands already counted in the starting state <int>
+                number of commands at the start of the stream to skip <int>
+
+        Output: snapshots (generator) [ (state (horizontal <int>, depth <int>, aim <int>),
+                                         number of commands <int>,
+                                         unrecognized commands since the last snapshot [ (command number <int>, command word <str>) ]) ]
+    """
+    unrecognized_commands = []
+
+    for data in chunks:
+        opcodes, values = tokenize_commands(data)
+        chunk_unrecognized_commands = find_unrecognized_commands(opcodes, data)
+
+        # Skip the commands that are already counted in the starting state
+        if skip > 0:
+            skipped = min(skip, len(opcodes))
+            opcodes, values = opcodes[skipped:], values[skipped:]
+            chunk_unrecognized_commands = [(command_number - skipped, command_word) for command_number, command_word in chunk_unrecognized_commands if command_number > skipped]
+            skip -= skipped
+
+        start = 0
+
+        while start < len(opcodes):
+            # Stop at the next snapshot or the end of the chunk
+            stop = min(len(opcodes), start + snapshot_every - command_count % snapshot_every)
+
+            state = compose_aiming_transforms(state, pilot_by_aiming(opcodes[start:stop], values[start:stop]))
+            unrecognized_commands.extend((command_count + command_number - start, command_word) for command_number, command_word in chunk_unrecognized_commands if start < command_number <= stop)
+            command_count += stop - start
+            start = stop
+
+            if command_count % snapshot_every == 0:
+                yield state, command_count, unrecognized_commands
+                unrecognized_commands = []
+
+    # Final snapshot
+    if command_count % snapshot_every != 0 or unrecognized_commands:
+        yield state, command_count, unrecognized_commands
+
+
+def load_snapshot(file_name):
+    """ Load a snapshot saved with save_snapshot().
+
+        Input:  snapshot file name <str>
+
+        Output: state (horizontal <int>, depth <int>, aim <int>)
+                number of commands <int>
+    """
+    with open(file_name, 'r') as FILE:
+        snapshot = json.load(FILE)
+
+    return (snapshot["horizontal"], snapshot["depth"], snapshot["aim"]), snapshot["command_count"]
+
+
+def save_snapshot(file_name, state, command_count):
+    """ Save a snapshot of the submarine's state. The file is replaced in one
+        step so a crash never leaves half a snapshot.
+
+        Input:  snapshot file name <str>
+                state (horizontal <int>, depth <int>, aim <int>)
+                number of commands <int>
+
+        Output: None
+    """
+    horizontal_position, depth_position, aim = state
+
+    snapshot = {
+        "horizontal": horizontal_position,
+        "depth": depth_position,
+        "aim": aim,
+        "command_count": command_count,
+    }
+
+    with open(file_name + ".tmp", 'w') as FILE:
+        json.dump(snapshot, FILE)
+
+    os.replace(file_name + ".tmp", file_name)
+
+
+class Trajectory(object):
+    """ The state of the submarine after every command, read from a memory
+        mapped trajectory file. Looking up a state is O(1).
+
+        Input:  trajectory file name <str>
+    """
+    def __init__(self, file_name):
+        with open(file_name, 'rb') as FILE:
+            magic, self.__model, self.__command_count = TRAJECTORY_HEADER.unpack(FILE.read(TRAJECTORY_HEADER.size))
+
+        if magic != TRAJECTORY_MAGIC:
+            raise ValueError("Not a trajectory file: {}".format(file_name))
+
+        require_numpy()
+
+        # The (horizontal, depth, aim) record after each command
+        if self.__command_count > 0:
+            self.__states = numpy.memmap(file_name, dtype=trajectory_dtype(), mode='r', offset=TRAJECTORY_HEADER.size, shape=(self.__command_count,))
+        else:
+            self.__states = numpy.empty(0, dtype=trajectory_dtype())
+
+    def getCommandCount(self):
+        """ Get the number of commands in the trajectory.
+
+            Input:  None
+
+            Output: number of commands <int>
+        """
+        return self.__command_count
+
+    def getModel(self):
+        """ Get the piloting model (BASIC or AIMING) of the trajectory.
+
+            Input:  None
+
+            Output: piloting model <int>
+        """
+        return self.__model
+
+    def getState(self, step):
+        """ Get the state of the submarine after the given number of commands.
+            Step 0 is the starting state.
+
+            Input:  number of commands <int>
+
+            Output: horizontal position <int>
+                    depth position <int>
+                    aim <int>
+        """
+        if step < 0 or step > self.__command_count:
+            raise IndexError("Step {} is outside the trajectory (0-{}).".format(step, self.__command_count))
+
+        # Starting state
+        if step == 0:
+            return 0, 0, 0
+
+        horizontal_position, depth_position, aim = self.__states[step - 1].tolist()
+
+        return horizontal_position, depth_position, aim
+
+    def getStates(self):
+        """ Get the memory mapped state records. One record per command.
+
+            Input:  None
+
+            Output: states <numpy.ndarray [("horizontal", "depth", "aim")]>
+        """
+        return self.__states
+
+
+def trajectory_dtype():
+    """ Get the NumPy record type of one trajectory state.
+
+        Input:  None
+
+        Output: record type <numpy.dtype>
+    """
+    require_numpy()
+
+    return numpy.dtype([("horizontal", "<i8"), ("depth", "<i8"), ("aim", "<i8")])
+
+
+def build_trajectory(opcodes, values, model=AIMING):
+    """ Calculate the state of the submarine after every command. With the
+        basic model the aim is always 0.
+
+        Input:  opcodes <numpy.ndarray>
+                values <numpy.ndarray>
+                piloting model (BASIC or AIMING) <int>
+
+        Output: states <numpy.ndarray [("horizontal", "depth", "aim")]>
+    """
+    require_numpy()
+
+    states = numpy.zeros(len(opcodes), dtype=trajectory_dtype())
+
+    forward_values = numpy.where(opcodes == FORWARD, values, 0)
+    down_up_values = numpy.where(opcodes == DOWN, values, 0) - numpy.where(opcodes == UP, values, 0)
+
+    states["horizontal"] = numpy.cumsum(forward_values)
+
+    # Aiming. Down and up change the aim. Forward dives by aim * value.
+    if model == AIMING:
+        states["aim"] = numpy.cumsum(down_up_values)
+        states["depth"] = numpy.cumsum(states["aim"] * forward_values)
+    # Basic. Down and up change the depth.
+    else:
+        states["depth"] = numpy.cumsum(down_up_values)
+
+    return states
+
+
+def save_trajectory(file_name, states, model=AIMING):
+    """ Save the states of a trajectory to the given file so it can be memory
+        mapped by Trajectory.
+
+        Input:  trajectory file name <str>
+                states <numpy.ndarray [("horizontal", "depth", "aim")]>
+                piloting model (BASIC or AIMING) <int>
+
+        Output: None
+    """
+    with open(file_name, 'wb') as FILE:
+        FILE.write(TRAJECTORY_HEADER.pack(TRAJECTORY_MAGIC, model, len(states)))
+        states.tofile(FILE)
+
+
+class DepthRangeQueries(object):
+    """ Answers "maximum depth between command a and command b" and "first
+        command where the depth exceeds X" over a trajectory without replaying
+        the commands. Commands are numbered from 1.
+
+        The depths are split into blocks. The max of every run of 2^k blocks is
+        kept in a sparse table, and the max from each depth to the start and to
+        the end of its block is kept too, so a range max is at most three
+        lookups. Ranges inside a single block are scanned (at most one block).
+
+        Input:  depth after each command [ depth <int> ]
+                number of depths per block <int>
+    """
+    def __init__(self, depths, block_size=32):
+        require_numpy()
+
+        # Depth after each command
+        self.__depths = numpy.ascontiguousarray(depths, dtype=numpy.int64)
+        self.__block_size = block_size
+
+        # Pad the last block so the depths can be reshaped into blocks
+        block_count = -(-len(self.__depths) // block_size)
+        blocks = numpy.full(block_count * block_size, numpy.iinfo(numpy.int64).min, dtype=numpy.int64)
+        blocks[:len(self.__depths)] = self.__depths
+        blocks = blocks.reshape(block_count, block_size)
+
+        # Max from the start of the block to each depth, and from each depth to
+        # the end of the block
+        self.__prefix_max = numpy.maximum.accumulate(blocks, axis=1).ravel()
+        self.__suffix_max = numpy.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+        # Sparse table. Level k holds the max of 2^k blocks starting at each
+        # block.
+        self.__sparse_table = [blocks.max(axis=1)]
+        while (1 << len(self.__sparse_table)) <= block_count:
+            level = self.__sparse_table[-1]
+            half = 1 << (len(self.__sparse_table) - 1)
+            self.__sparse_table.append(numpy.maximum(level[:-half], level[half:]))
+
+        # Deepest depth so far after each command
+        self.__running_max = numpy.maximum.accumulate(self.__depths)
+
+    def __blockRangeMax(self, first_blocks, last_blocks):
+        """ Get the max depth of each range of whole blocks (inclusive).
+
+            Input:  first blocks <numpy.ndarray>
+                    last blocks <numpy.ndarray>
+
+            Output: max depths <numpy.ndarray>
+        """
+        # Largest power of 2 that fits in each range. Two (overlapping) runs of
+        # that many blocks cover the range.
+        levels = numpy.frexp(last_blocks - first_blocks + 1)[1] - 1
+
+        max_depths = numpy.empty(len(first_blocks), dtype=numpy.int64)
+
+        for level in numpy.unique(levels):
+            selected = levels == level
+            table = self.__sparse_table[level]
+            max_depths[selected] = numpy.maximum(table[first_blocks[selected]], table[last_blocks[selected] - (1 << level) + 1])
+
+        return max_depths
+
+    def firstDepthAbove(self, depth, start=1):
+        """ Find the first command, at or after the start command, after which
+            the depth is greater than the given depth.
+
+            Input:  depth <int>
+                    first command to check <int>
+
+            Output: command number, -1 if the depth is never exceeded <int>
+        """
+        command_count = len(self.__depths)
+
+        # From the first command. The running max never decreases, so it can
+        # be searched.
+        if start <= 1:
+            return int(self.firstDepthsAbove(numpy.array([depth]))[0])
+
+        if start > command_count or self.maxDepth(start, command_count) <= depth:
+            return -1
+
+        # Binary search for the shortest range from the start command that goes
+        # deeper than the given depth
+        low, high = start, command_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.maxDepth(start, middle) > depth:
+                high = middle
+            else:
+                low = middle + 1
+
+        return low
+
+    def firstDepthsAbove(self, depths):
+        """ Find the first command after which the depth is greater than each
+            of the given depths.
+
+            Input:  depths <numpy.ndarray>
+
+            Output: command numbers, -1 if the depth is never exceeded <numpy.ndarray>
+        """
+        indexes = numpy.searchsorted(self.__running_max, depths, side='right')
+
+        return numpy.where(indexes < len(self.__depths), indexes + 1, -1)
+
+    def maxDepth(self, first, last):
+        """ Get the max depth after any command from the first to the last
+            command (inclusive).
+
+            Input:  first command <int>
+                    last command <int>
+
+            Output: max depth <int>
+        """
+        return int(self.maxDepths(numpy.array([first]), numpy.array([last]))[0])
+
+    def maxDepths(self, firsts, lasts):
+        """ Get the max depth after any command from each first command to each
+            last command (inclusive). All the ranges are answered at once.
+
+            Input:  first commands <numpy.ndarray>
+                    last commands <numpy.ndarray>
+
+            Output: max depths <numpy.ndarray>
+        """
+        firsts = numpy.asarray(firsts, dtype=numpy.int64) - 1
+        lasts = numpy.asarray(lasts, dtype=numpy.int64) - 1
+
+        if numpy.any(firsts < 0) or numpy.any(lasts >= len(self.__depths)) or numpy.any(firsts > lasts):
+            raise IndexError("Command ranges must be within 1-{} and not empty.".format(len(self.__depths)))
+
+        first_blocks = firsts // self.__block_size
+        last_blocks = lasts // self.__block_size
+
+        max_depths = numpy.empty(len(firsts), dtype=numpy.int64)
+
+        # Ranges that span blocks. The end of the first block, the start of
+        # the last block, and the whole blocks in between.
+        spans = first_blocks != last_blocks
+        span_max_depths = numpy.maximum(self.__suffix_max[firsts[spans]], self.__prefix_max[lasts[spans]])
+
+        inner = first_blocks[spans] + 1 <= last_blocks[spans] - 1
+        span_max_depths[inner] = numpy.maximum(span_max_depths[inner], self.__blockRangeMax(first_blocks[spans][inner] + 1, last_blocks[spans][inner] - 1))
+
+        max_depths[spans] = span_max_depths
+
+        # Ranges inside one block. Scan the block one offset at a time.
+        inside = ~spans
+        inside_firsts = firsts[inside]
+        inside_lasts = lasts[inside]
+        inside_max_depths = self.__depths[inside_firsts]
+
+        for offset in range(1, self.__block_size):
+            inside_max_depths = numpy.maximum(inside_max_depths, self.__depths[numpy.minimum(inside_firsts + offset, inside_lasts)])
+
+        max_depths[inside] = inside_max_depths
+
+        return max_depths
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 
 import argparse
-import re
+
+from pilot_commands import find_unrecognized_commands, load_compacted_commands, parse_commands_vectorized, pilot, pilot_vectorized, tokenize_commands
 
 
 def main():
@@ -16,48 +17,52 @@ def main():
 
     parser = argparse.ArgumentParser(description=description)
     parser.add_argument("file", help="Text file with depth values. One value per line.")
+    parser.add_argument("-v", "--vectorized", action="store_true", help="Parse and run all the commands at once with NumPy")
+    parser.add_argument("-c", "--compacted", action="store_true", help="File is a compacted command file (see compact_commands.py)")
 
     args = parser.parse_args()
 
+    # Compacted files are replayed run by run
+    if args.compacted and args.vectorized:
+        parser.error("--compacted can't be used with --vectorized")
+
     ###########################################################################
     # Read in directions
     ###########################################################################
 
-    try:
-        with open(args.file, 'r') as FILE:
-            directions = FILE.readlines()
-    except Exception:
-        raise
+    # Compacted mode. Each run of the same command is replayed as a single
+    # command. Unknown commands were reported when the file was compacted.
+    if args.compacted:
+        opcodes, values, _, _ = load_compacted_commands(args.file)
+    else:
+        try:
+            with open(args.file, 'rb') as FILE:
+                data = FILE.read()
+        except Exception:
+            raise
+
+        # Vectorized mode turns the whole file into NumPy opcode and value
+        # arrays. Otherwise use the shared command tokenizer.
+        if args.vectorized:
+            opcodes, values = parse_commands_vectorized(data)
+        else:
+            opcodes, values = tokenize_commands(data)
 
     ###########################################################################
     # Calculate submarine location
     ###########################################################################
 
-    # The depth and horizontal positions
-    depth_position = 0
-    horizontal_position = 0
-
-    # Analyze each direction
-    for direction in directions:
-        # Split the direction into command and value
-        command, value = re.split(r"\s+", direction.strip())
-
-        # Sanitize the value and command
-        value = int(value)
-        command = command.lower()
-
-        # Horizontal forward
-        if command == "forward":
-            horizontal_position += value
-        # Depth down
-        elif command == "down":
-            depth_position += value
-        # Depth up
-        elif command == "up":
-            depth_position -= value
-        # Unknown command
-        else:
-            print("ERROR: Unrecognized command: {}".format(command))
+    # Vectorized mode. Add up the values of each kind of command.
+    if args.vectorized:
+        horizontal_position, depth_position = pilot_vectorized(opcodes, values)
+    # Run each command
+    else:
+        horizontal_position, depth_position = pilot(opcodes, values)
+
+    # Unknown commands don't move the submarine
+    if not args.compacted:
+        for command_number, command_word in find_unrecognized_commands(opcodes, data):
+            print("ERROR: Unrecognized command number {}: {}".format(command_number, command_word))
 
     ###########################################################################
     # Report
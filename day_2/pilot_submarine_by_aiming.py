@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
 import argparse
-import re
+import os
+import sys
+
+from pilot_commands import find_unrecognized_commands, load_compacted_commands, load_snapshot, parse_commands_vectorized, pilot_by_aiming, pilot_by_aiming_parallel, pilot_by_aiming_vectorized, read_commands, save_snapshot, stream_pilot_by_aiming, tokenize_commands
 
 
 def main():
@@ -15,51 +18,116 @@ def main():
     description = "Read in the piloting instructions provided by the given file. Report the submarine's final position."
 
     parser = argparse.ArgumentParser(description=description)
-    parser.add_argument("file", help="Text file with depth values. One value per line.")
+    parser.add_argument("file", help="Text file with depth values. One value per line. Use - to read stdin with --stream.")
+    parser.add_argument("-v", "--vectorized", action="store_true", help="Parse and run all the commands at once with NumPy")
+    parser.add_argument("-c", "--compacted", action="store_true", help="File is a compacted command file (see compact_commands.py)")
+    parser.add_argument("-p", "--processes", type=int, help="Run chunks of the file in parallel with this many processes (0 for one per CPU)")
+
+    parser.add_argument("-s", "--stream", action="store_true", help="Stream the commands with bounded memory and report snapshots")
+    parser.add_argument("-e", "--snapshot-every", type=int, help="Number of commands between snapshots with --stream", default=1000000)
+    parser.add_argument("--snapshot", help="File to save each snapshot to with --stream")
+    parser.add_argument("--resume", action="store_true", help="Start from the state in the --snapshot file. The input is read as new commands.")
+    parser.add_argument("--skip-counted", action="store_true", help="With --resume, skip the commands the snapshot already counted (the input is a replay of the same log)")
 
     args = parser.parse_args()
 
+    # Compacted files are replayed run by run
+    if args.compacted and (args.vectorized or args.stream or args.processes is not None):
+        parser.error("--compacted can't be used with --vectorized, --stream or --processes")
+
+    # Only a resumed stream has counted commands to skip
+    if args.skip_counted and not args.resume:
+        parser.error("--skip-counted needs --resume")
+
+    # Snapshots are taken every so many commands
+    if args.snapshot_every < 1:
+        parser.error("--snapshot-every must be at least 1")
+
+    # The state to resume from is in the snapshot file
+    if args.resume and not args.snapshot:
+        parser.error("--resume needs --snapshot")
+
+    ###########################################################################
+    # Stream commands
+    ###########################################################################
+
+    # Streaming mode. Read the commands a chunk at a time (from a file or a
+    # pipe) and report the state every so many commands.
+    if args.stream:
+        state, command_count = (0, 0, 0), 0
+
+        # Start from the last snapshot
+        if args.resume and args.snapshot and os.path.exists(args.snapshot):
+            state, command_count = load_snapshot(args.snapshot)
+
+        # A replayed log starts with the commands the snapshot already counted.
+        # A live feed only sends new commands, so nothing is skipped.
+        skip = command_count if args.skip_counted else 0
+
+        try:
+            with open(args.file, 'rb') if args.file != "-" else open(sys.stdin.fileno(), 'rb', closefd=False) as FILE:
+                for state, command_count, unrecognized_commands in stream_pilot_by_aiming(read_commands(FILE), args.snapshot_every, state, command_count, skip):
+                    # Unknown commands don't move the submarine
+                    for command_number, command_word in unrecognized_commands:
+                        print("ERROR: Unrecognized command number {}: {}".format(command_number, command_word))
+
+                    print("Commands: {}  Horizontal Position: {}  Depth Position: {}  Aim: {}".format(command_count, *state), flush=True)
+
+                    if args.snapshot:
+                        save_snapshot(args.snapshot, state, command_count)
+        except Exception:
+            raise
+
+        horizontal_position, depth_position, aim = state
+
     ###########################################################################
     # Read in directions
     ###########################################################################
 
-    try:
-        with open(args.file, 'r') as FILE:
-            directions = FILE.readlines()
-    except Exception:
-        raise
+    # Streaming and parallel modes read their own chunks of the file
+    if not args.stream and args.processes is None:
+        # Compacted mode. Each run of the same command is replayed as a single
+        # command. Unknown commands were reported when the file was compacted.
+        if args.compacted:
+            opcodes, values, _, _ = load_compacted_commands(args.file)
+            unrecognized_commands = []
+        else:
+            try:
+                with open(args.file, 'rb') as FILE:
+                    data = FILE.read()
+            except Exception:
+                raise
+
+            # Vectorized mode turns the whole file into NumPy opcode and value
+            # arrays. Otherwise use the shared command tokenizer.
+            if args.vectorized:
+                opcodes, values = parse_commands_vectorized(data)
+            else:
+                opcodes, values = tokenize_commands(data)
+
+            unrecognized_commands = find_unrecognized_commands(opcodes, data)
 
     ###########################################################################
     # Calculate submarine location
     ###########################################################################
 
-    # The depth and horizontal positions
-    depth_position = 0
-    horizontal_position = 0
-    aim = 0
-
-    # Analyze each direction
-    for direction in directions:
-        # Split the direction into command and value
-        command, value = re.split(r"\s+", direction.strip())
-
-        # Sanitize the value and command
-        value = int(value)
-        command = command.lower()
-
-        # Horizontal forward
-        if command == "forward":
-            horizontal_position += value
-            depth_position += aim * value
-        # Depth down
-        elif command == "down":
-            aim += value
-        # Depth up
-        elif command == "up":
-            aim -= value
-        # Unknown command
-        else:
-            print("ERROR: Unrecognized command: {}".format(command))
+    # Parallel mode. Each process turns a chunk of the file into one
+    # (horizontal, depth, aim) transform. The transforms are composed in order.
+    if args.stream:
+        unrecognized_commands = []
+    elif args.processes is not None:
+        horizontal_position, depth_position, aim, unrecognized_commands = pilot_by_aiming_parallel(args.file, args.processes)
+    # Vectorized mode. The aim is the running sum of the down and up values.
+    # The depth is the sum of aim * value over the forward commands.
+    elif args.vectorized:
+        horizontal_position, depth_position, aim = pilot_by_aiming_vectorized(opcodes, values)
+    # Run each command
+    else:
+        horizontal_position, depth_position, aim = pilot_by_aiming(opcodes, values)
+
+    # Unknown commands don't move the submarine
+    for command_number, command_word in unrecognized_commands:
+        print("ERROR: Unrecognized command number {}: {}".format(command_number, command_word))
 
     ###########################################################################
     # Report
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from pilot_commands import AIMING, BASIC, DepthRangeQueries, Trajectory, build_trajectory, find_unrecognized_commands, parse_commands_vectorized, save_trajectory
+
+
+def main():
+    """ Build a trajectory file with the submarine's state after every
+        piloting command, or look up states in a saved trajectory file.
+    """
+    ###########################################################################
+    # Command line argument parser
+    ###########################################################################
+
+    description = "Build a trajectory file with the submarine's state after every\n" \
+                  "piloting command, or look up states in a saved trajectory file."
+
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build a trajectory from a file of piloting commands.")
+    build_parser.add_argument("file", help="Text file with piloting commands. One command per line.")
+    build_parser.add_argument("trajectory", help="Trajectory file to write.")
+    build_parser.add_argument("-b", "--basic", action="store_true", help="Use the basic model (down and up change the depth) instead of aiming")
+
+    query_parser = subparsers.add_parser("query", help="Look up states in a saved trajectory.")
+    query_parser.add_argument("trajectory", help="Trajectory file to read.")
+    query_parser.add_argument("-k", "--step", type=int, action="append", default=[], help="Report the state after this many commands")
+    query_parser.add_argument("-m", "--max-depth", type=int, nargs=2, action="append", default=[], metavar=("FIRST", "LAST"), help="Report the max depth from the first to the last command")
+    query_parser.add_argument("-x", "--exceeds", type=int, action="append", default=[], help="Report the first command after which the depth exceeds this depth")
+
+    args = parser.parse_args()
+
+    ###########################################################################
+    # Build
+    ###########################################################################
+
+    if args.command == "build":
+        model = BASIC if args.basic else AIMING
+
+        try:
+            with open(args.file, 'rb') as FILE:
+                data = FILE.read()
+        except Exception:
+            raise
+
+        opcodes, values = parse_commands_vectorized(data)
+
+        # Report the unknown commands. They don't move the submarine.
+        for command_number, command_word in find_unrecognized_commands(opcodes, data):
+            print("ERROR: Unrecognized command number {}: {}".format(command_number, command_word))
+
+        save_trajectory(args.trajectory, build_trajectory(opcodes, values, model), model)
+
+        print("Piloting model:      {}".format("basic" if args.basic else "aiming"))
+        print("Number of commands:  {}".format(len(opcodes)))
+        print("Trajectory file:     {}".format(args.trajectory))
+
+        exit(0)
+
+    ###########################################################################
+    # Query
+    ###########################################################################
+
+    trajectory = Trajectory(args.trajectory)
+
+    print("Piloting model:      {}".format("aiming" if trajectory.getModel() == AIMING else "basic"))
+    print("Number of commands:  {}".format(trajectory.getCommandCount()))
+
+    for step in args.step:
+        horizontal_position, depth_position, aim = trajectory.getState(step)
+
+        print()
+        print("After command {}:".format(step))
+        print("Depth Position:      {}".format(depth_position))
+        print("Horizontal Position: {}".format(horizontal_position))
+        print("Aim:                 {}".format(aim))
+
+    # Range queries. Build the range max tables once for all the queries.
+    if args.max_depth or args.exceeds:
+        depth_range_queries = DepthRangeQueries(trajectory.getStates()["depth"])
+
+        print()
+
+        for first, last in args.max_depth:
+            print("Max depth from command {} to {}: {}".format(first, last, depth_range_queries.maxDepth(first, last)))
+
+        for depth in args.exceeds:
+            print("First command deeper than {}: {}".format(depth, depth_range_queries.firstDepthAbove(depth)))
+
+    exit(0)
+
+
+if __name__ == '__main__':
+    main()
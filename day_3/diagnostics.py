@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+from bisect import bisect_left
+from multiprocessing import Pool
+from operator import itemgetter
+
+# NumPy is only needed for the vectorized engines
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of rows to count at a time in the vectorized engine
+BLOCK_ROWS = 1024 * 1024
+
+# Number of bytes of bits to pack or unpack at a time in the wide engine. The
+# number of rows in a block depends on how wide the values are.
+BLOCK_BYTES = 64 * 1024 * 1024
+
+# Default directory for the saved column counts of diagnostic shards. Kept in
+# the user's cache, not next to the data.
+COUNTS_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "advent_of_code_2021", "diagnostic_counts")
+
+
+def require_numpy():
+    """ Make sure NumPy is available. The vectorized engines need it.
+
+        Input:  None
+
+        Output: None
+    """
+    if numpy is None:
+        raise ImportError("NumPy is required for the vectorized diagnostic engines.")
+
+
+def map_diagnostic_file(file_name):
+    """ Memory map a diagnostic report as a matrix of bytes. One row per line;
+        the line endings are left out of the view. Nothing is copied.
+
+        Input:  file name <str>
+
+        Output: bit matrix of "0" and "1" bytes <numpy.ndarray uint8 (rows, bits)>
+                last line, if the file doesn't end with a line ending <bytes>
+    """
+    require_numpy()
+
+    # An empty file can't be memory mapped
+    if os.path.getsize(file_name) == 0:
+        return numpy.empty((0, 0), dtype=numpy.uint8), b""
+
+    # Every line has the same length. The first line gives the row width,
+    # including "\n" or "\r\n".
+    with open(file_name, 'rb') as FILE:
+        first_line = FILE.readline()
+
+    # A single line without a line ending
+    if not first_line.endswith(b"\n"):
+        return numpy.empty((0, len(first_line.strip())), dtype=numpy.uint8), first_line.strip()
+
+    row_width = len(first_line)
+    bit_count = len(first_line.rstrip(b"\r\n"))
+
+    data = numpy.memmap(file_name, dtype=numpy.uint8, mode='r')
+
+    # The last line might not have a line ending
+    row_count = len(data) // row_width
+    last_line = data[row_count * row_width:].tobytes().strip()
+
+    matrix = data[:row_count * row_width].reshape(row_count, row_width)[:, :bit_count]
+
+    return matrix, last_line
+
+
+def count_bits_vectorized(matrix, last_line=b"", block_rows=BLOCK_ROWS):
+    """ Count the bits in each column of a bit matrix of "0" and "1" bytes.
+        The count goes up by 1 for each "1" and down by 1 for each "0", the
+        same as the bit counter in submarine_power_consumption.py.
+
+        A "1" byte is one more than a "0" byte, so the number of 1s in a column
+        is the column's byte sum minus "0" times the number of rows. No
+        temporary arrays are made.
+
+        Input:  bit matrix <numpy.ndarray uint8 (rows, bits)>
+                last line, if the file didn't end with a line ending <bytes>
+                number of rows to sum at a time <int>
+
+        Output: bit counter [ count <int> ]
+                number of rows <int>
+    """
+    require_numpy()
+
+    row_count, bit_count = matrix.shape
+    ones = numpy.zeros(bit_count, dtype=numpy.int64)
+
+    for start in range(0, row_count, block_rows):
+        block = matrix[start:start+block_rows]
+
+        # Only "0" and "1" are allowed
+        if block.size and (block.min() < ord("0") or block.max() > ord("1")):
+            raise ValueError("Invalid bit value found between line numbers {} and {}.".format(start + 1, start + len(block)))
+
+        ones += block.sum(axis=0, dtype=numpy.int64) - ord("0") * len(block)
+
+    # The last line without a line ending
+    if last_line:
+        ones += numpy.frombuffer(last_line, dtype=numpy.uint8) - ord("0")
+        row_count += 1
+
+    return (2 * ones - row_count).tolist(), row_count
+
+
+def count_diagnostic_shard(file_name):
+    """ Count the 1s in each column of a diagnostic report. Uses the
+        vectorized engine when NumPy is available.
+
+        Input:  file name <str>
+
+        Output: number of rows <int>
+                number of 1s in each column [ count <int> ]
+    """
+    # Vectorized. Turn the +1/-1 bit counter back into counts of 1s.
+    if numpy is not None:
+        bit_counter, row_count = count_bits_vectorized(*map_diagnostic_file(file_name))
+        return row_count, [(count + row_count) // 2 for count in bit_counter]
+
+    with open(file_name, 'r') as FILE:
+        diagnostic_data = [value.strip() for value in FILE.readlines() if value.strip()]
+
+    # Count the 1s one column at a time
+    return len(diagnostic_data), [column.count("1") for column in zip(*diagnostic_data)]
+
+
+def shard_counts_file_name(file_name, counts_dir=COUNTS_DIR):
+    """ Get the name of the file the column counts of a shard are saved in.
+        Shards with the same name in different directories get different
+        files.
+
+        Input:  shard file name <str>
+                directory for saved counts <str>
+
+        Output: counts file name <str>
+    """
+    path_hash = hashlib.sha1(os.path.abspath(file_name).encode()).hexdigest()[:16]
+
+    return os.path.join(counts_dir, "{}.{}.counts".format(os.path.basename(file_name), path_hash))
+
+
+def get_shard_counts(file_name, counts_dir=COUNTS_DIR):
+    """ Get the column counts of a diagnostic shard. The counts are saved in
+        the counts directory and reused until the shard changes. If the counts
+        can't be read or saved, the shard is just counted. Runs in a worker
+        process.
+
+        Input:  shard file name <str>
+                directory for saved counts <str>
+
+        Output: number of rows <int>
+                number of 1s in each column [ count <int> ]
+    """
+    counts_file_name = shard_counts_file_name(file_name, counts_dir)
+    shard_stat = os.stat(file_name)
+
+    # Reuse the saved counts if the shard hasn't changed since
+    try:
+        with open(counts_file_name, 'r') as FILE:
+            counts = json.load(FILE)
+
+        if counts["size"] == shard_stat.st_size and counts["mtime_ns"] == shard_stat.st_mtime_ns:
+            return counts["rows"], counts["ones"]
+    # No saved counts (or unreadable ones). Count the shard again.
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    row_count, ones = count_diagnostic_shard(file_name)
+
+    try:
+        os.makedirs(counts_dir, exist_ok=True)
+
+        with open(counts_file_name + ".tmp", 'w') as FILE:
+            json.dump({"size": shard_stat.st_size, "mtime_ns": shard_stat.st_mtime_ns, "rows": row_count, "ones": ones}, FILE)
+
+        os.replace(counts_file_name + ".tmp", counts_file_name)
+    # The counts directory can't be written. The counts are still good.
+    except OSError:
+        pass
+
+    return row_count, ones
+
+
+def merge_shard_counts(shard_counts):
+    """ Merge the column counts of many shards. Counts are merged by adding
+        them up, so the shards can be merged in any order.
+
+        Input:  shard counts [ (number of rows <int>, number of 1s in each column [ count <int> ]) ]
+
+        Output: number of rows <int>
+                number of 1s in each column [ count <int> ]
+    """
+    row_count = 0
+    ones = []
+
+    for shard_row_count, shard_ones in shard_counts:
+        # Skip empty shards
+        if shard_row_count == 0:
+            continue
+
+        if ones and len(ones) != len(shard_ones):
+            raise ValueError("Shards have different numbers of bits ({} and {}).".format(len(ones), len(shard_ones)))
+
+        row_count += shard_row_count
+        ones = [count + shard_count for count, shard_count in zip(ones, shard_ones)] if ones else list(shard_ones)
+
+    return row_count, ones
+
+
+def count_shards_parallel(file_names, processes=None, counts_dir=COUNTS_DIR):
+    """ Count the 1s in each column of many diagnostic shards with a pool of
+        processes. Only new or changed shards are counted; the others reuse
+        their saved counts.
+
+        Input:  shard file names [ file name <str> ]
+                number of processes, None for one per CPU <int>
+                directory for saved counts <str>
+
+        Output: number of rows <int>
+                number of 1s in each column [ count <int> ]
+    """
+    with Pool(processes or os.cpu_count()) as pool:
+        return merge_shard_counts(pool.starmap(get_shard_counts, [(file_name, counts_dir) for file_name in file_names]))
+
+
+def find_rating_sorted(sorted_dataset, rule):
+    """ Find a life support rating in a sorted dataset of binary strings. All
+        the values left after filtering on the first bits share those bits, so
+        they sit next to each other in sorted order. Each filter step narrows a
+        [lo, hi) range with one bisect instead of recounting and copying the
+        dataset. The 0s come before the 1s in the range.
+
+        Input:  sorted binary dataset [ binary value <str> ]
+                selection rule (number of 1s <int>, number of 0s <int>) <bit to keep <int>>
+
+        Output: rating, -1 if a single value was not found <int>
+    """
+    lo, hi = 0, len(sorted_dataset)
+
+    for bit_index in range(len(sorted_dataset[0]) if sorted_dataset else 0):
+        # A single value is left
+        if hi - lo == 1:
+            break
+
+        # First value in the range with a 1 bit
+        split = bisect_left(sorted_dataset, "1", lo, hi, key=itemgetter(bit_index))
+
+        ones = hi - split
+        zeros = split - lo
+
+        # Keep the 1s or the 0s
+        if rule(ones, zeros) == 1:
+            lo = split
+        else:
+            hi = split
+
+        # Every value was filtered out
+        if hi == lo:
+            break
+
+    # Could not find the rating
+    if hi - lo != 1:
+        return -1
+
+    return int(sorted_dataset[lo], 2)
+
+
+def pack_bit_matrix(matrix, last_line=b"", block_bytes=BLOCK_BYTES):
+    """ Pack a bit matrix of "0" and "1" bytes into 8 bits per byte. Each row
+        becomes a row of packed bytes, first bit in the high bit of the first
+        byte. Wide values (thousands of bits) take 1/8 of the memory of the
+        text and are never turned into Python strings.
+
+        Input:  bit matrix <numpy.ndarray uint8 (rows, bits)>
+                last line, if the file didn't end with a line ending <bytes>
+                number of "0" and "1" bytes to pack at a time <int>
+
+        Output: packed values <numpy.ndarray uint8 (rows, bytes)>
+                number of bits in a value <int>
+    """
+    require_numpy()
+
+    row_count, bit_count = matrix.shape
+
+    # The last line without a line ending is one more row
+    packed = numpy.empty((row_count + (1 if last_line else 0), (bit_count + 7) // 8), dtype=numpy.uint8)
+
+    # Size the blocks by bytes so wide values don't make huge temporaries
+    block_rows = max(1, block_bytes // max(bit_count, 1))
+
+    for start in range(0, row_count, block_rows):
+        block = matrix[start:start+block_rows]
+
+        # Only "0" and "1" are allowed
+        if block.size and (block.min() < ord("0") or block.max() > ord("1")):
+            raise ValueError("Invalid bit value found between line numbers {} and {}.".format(start + 1, start + len(block)))
+
+        packed[start:start+len(block)] = numpy.packbits(block == ord("1"), axis=1)
+
+    if last_line:
+        if last_line.strip(b"01"):
+            raise ValueError("Invalid bit value found on line number {}.".format(row_count + 1))
+
+        packed[-1] = numpy.packbits(numpy.frombuffer(last_line, dtype=numpy.uint8) == ord("1"))
+
+    return packed, bit_count
+
+
+def count_bits_packed(packed, bit_count, block_bytes=BLOCK_BYTES):
+    """ Count the bits in each column of packed values. The count goes up by 1
+        for each 1 and down by 1 for each 0, the same as the bit counter in
+        submarine_power_consumption.py. A block of rows is unpacked at a time.
+
+        Input:  packed values <numpy.ndarray uint8 (rows, bytes)>
+                number of bits in a value <int>
+                number of bits to unpack at a time <int>
+
+        Output: bit counter [ count <int> ]
+    """
+    require_numpy()
+
+    ones = numpy.zeros(bit_count, dtype=numpy.int64)
+
+    # Size the blocks by unpacked bytes so wide values don't make huge
+    # temporaries
+    block_rows = max(1, block_bytes // max(bit_count, 1))
+
+    for start in range(0, len(packed), block_rows):
+        ones += numpy.unpackbits(packed[start:start+block_rows], axis=1, count=bit_count).sum(axis=0, dtype=numpy.int64)
+
+    return (2 * ones - len(packed)).tolist()
+
+
+def find_rating_packed(packed, bit_count, rule):
+    """ Find a life support rating in packed values. Only the row numbers of
+        the values left are kept. Each filter step unpacks one bit column of
+        those rows and keeps the rows with the chosen bit, so no values are
+        copied.
+
+        Input:  packed values <numpy.ndarray uint8 (rows, bytes)>
+                number of bits in a value <int>
+                selection rule (number of 1s <int>, number of 0s <int>) <bit to keep <int>>
+
+        Output: rating, -1 if a single value was not found <int>
+    """
+    require_numpy()
+
+    rows = numpy.arange(len(packed))
+
+    for bit_index in range(bit_count):
+        # A single value is left
+        if len(rows) == 1:
+            break
+
+        # The bit column of the rows left
+        bits = (packed[rows, bit_index >> 3] >> (7 - (bit_index & 7))) & 1
+
+        ones = int(numpy.count_nonzero(bits))
+        zeros = len(rows) - ones
+
+        # Keep the 1s or the 0s
+        rows = rows[bits == rule(ones, zeros)]
+
+        # Every value was filtered out
+        if len(rows) == 0:
+            break
+
+    # Could not find the rating
+    if len(rows) != 1:
+        return -1
+
+    # Drop the padding bits of the last byte
+    return int.from_bytes(packed[rows[0]].tobytes(), 'big') >> (packed.shape[1] * 8 - bit_count)
+
+
+def least_common_bit(ones, zeros):
+    """ Selection rule. Keep the least common bit. Keep 0s on a tie. This is
+        the CO2 scrubber rule.
+
+        Input:  number of 1s <int>
+                number of 0s <int>
+
+        Output: bit to keep <int>
+    """
+    return 1 if ones < zeros else 0
+
+
+def least_common_nonzero_bit(ones, zeros):
+    """ Selection rule. Keep the least common bit, unless no values have it.
+        Then keep the other bit. Keep 0s on a tie.
+
+        Input:  number of 1s <int>
+                number of 0s <int>
+
+        Output: bit to keep <int>
+    """
+    if ones == 0 or zeros == 0:
+        return 1 if ones > 0 else 0
+
+    return least_common_bit(ones, zeros)
+
+
+def most_common_bit(ones, zeros):
+    """ Selection rule. Keep the most common bit. Keep 1s on a tie. This is
+        the oxygen generator rule.
+
+        Input:  number of 1s <int>
+                number of 0s <int>
+
+        Output: bit to keep <int>
+    """
+    return 1 if ones >= zeros else 0
+
+
+def most_common_bit_zero_tie(ones, zeros):
+    """ Selection rule. Keep the most common bit. Keep 0s on a tie.
+
+        Input:  number of 1s <int>
+                number of 0s <int>
+
+        Output: bit to keep <int>
+    """
+    return 1 if ones > zeros else 0
+
+
+# Selection rules by name
+SELECTION_RULES = {
+    "most-common": most_common_bit,
+    "most-common-zero-tie": most_common_bit_zero_tie,
+    "least-common": least_common_bit,
+    "least-common-nonzero": least_common_nonzero_bit,
+}
+
+
+class DiagnosticTrie(object):
+    """ A binary trie over diagnostic values. Each node keeps the number of
+        values below it, so the number of 1s and 0s at the next bit of any
+        group of filtered values is known without counting. A rating is a
+        single walk from the root. Any selection rule can be walked over the
+        same trie.
+
+        Input:  binary dataset [ binary value <str> ]
+    """
+    def __init__(self, dataset):
+        # Number of bits per value
+        self.__bit_count = len(dataset[0]) if dataset else 0
+
+        # Nodes are numbered. Node 0 is the root. Child -1 means no child.
+        self.__children = [[-1, -1]]
+        self.__counts = [0]
+
+        for binary_value in dataset:
+            self.insert(binary_value)
+
+    def findRating(self, rule):
+        """ Walk the trie with the given selection rule. At each bit, the rule
+            picks the bit to keep from the number of 1s and 0s left. The walk
+            stops filtering once a single value is left.
+
+            Input:  selection rule (number of 1s <int>, number of 0s <int>) <bit to keep <int>>
+
+            Output: rating, -1 if a single value was not found <int>
+        """
+        node = 0
+        rating = 0
+
+        for _ in range(self.__bit_count):
+            zero_child, one_child = self.__children[node]
+
+            # A single value is left. Follow it to the end.
+            if self.__counts[node] == 1:
+                bit = 1 if one_child >= 0 else 0
+            else:
+                zeros = self.__counts[zero_child] if zero_child >= 0 else 0
+                ones = self.__counts[one_child] if one_child >= 0 else 0
+                bit = rule(ones, zeros)
+
+            node = self.__children[node][bit]
+            rating = rating * 2 + bit
+
+            # Every value was filtered out
+            if node < 0:
+                return -1
+
+        # More than one value is the same as the rating (duplicates)
+        if self.__counts[node] != 1:
+            return -1
+
+        return rating
+
+    def getValueCount(self):
+        """ Get the number of values in the trie.
+
+            Input:  None
+
+            Output: number of values <int>
+        """
+        return self.__counts[0]
+
+    def insert(self, binary_value):
+        """ Add a binary value to the trie.
+
+            Input:  binary value <str>
+
+            Output: None
+        """
+        node = 0
+        self.__counts[0] += 1
+
+        for bit in binary_value:
+            bit = 1 if bit == "1" else 0
+
+            # New node
+            if self.__children[node][bit] < 0:
+                self.__children[node][bit] = len(self.__counts)
+                self.__children.append([-1, -1])
+                self.__counts.append(0)
+
+            node = self.__children[node][bit]
+            self.__counts[node] += 1
@@ -2,6 +2,8 @@
 
 import argparse
 
+from diagnostics import COUNTS_DIR, count_bits_packed, count_bits_vectorized, count_shards_parallel, map_diagnostic_file, pack_bit_matrix
+
 
 def main():
     """ Read in the submarine diagnostics provided by the given file. Report
@@ -18,50 +20,80 @@ def main():
 
     parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("file", help="Text file with diagnostic data.")
+    parser.add_argument("more_files", nargs="*", help="More diagnostic data shards (with --shards).")
+    parser.add_argument("-v", "--vectorized", action="store_true", help="Count the bits of the memory mapped file with NumPy column sums")
+    parser.add_argument("-w", "--wide", action="store_true", help="Pack each value into bytes and count unpacked bit arrays (for values thousands of bits wide)")
+    parser.add_argument("-s", "--shards", action="store_true", help="Count each shard in a process pool, saving the counts in --counts-dir for reuse")
+    parser.add_argument("-p", "--processes", type=int, help="Number of processes with --shards (default one per CPU)")
+    parser.add_argument("--counts-dir", help="Directory to save the shard counts in with --shards (default {})".format(COUNTS_DIR), default=COUNTS_DIR)
 
     args = parser.parse_args()
 
+    # More files are only read as shards
+    if args.more_files and not args.shards:
+        parser.error("more than one file needs --shards")
+
     ###########################################################################
     # Read in directions
     ###########################################################################
 
-    try:
-        with open(args.file, 'r') as FILE:
-            diagnostic_data = [value.strip() for value in FILE.readlines()]
-    except Exception:
-        raise
+    # Sharded mode. Count the 1s in each shard (or reuse its saved counts)
+    # and add the counts up.
+    if args.shards:
+        row_count, ones = count_shards_parallel([args.file] + args.more_files, args.processes, args.counts_dir)
+        bit_counter = [2 * count - row_count for count in ones]
+    # Vectorized mode. View the raw bytes of the file as a bit matrix and sum
+    # its columns.
+    elif args.vectorized:
+        bit_counter, row_count = count_bits_vectorized(*map_diagnostic_file(args.file))
+    # Wide mode. Pack the values 8 bits per byte, then unpack blocks of rows
+    # to count the bits.
+    elif args.wide:
+        packed, bit_count = pack_bit_matrix(*map_diagnostic_file(args.file))
+        bit_counter = count_bits_packed(packed, bit_count)
+        row_count = len(packed)
+    else:
+        try:
+            with open(args.file, 'r') as FILE:
+                diagnostic_data = [value.strip() for value in FILE.readlines()]
+        except Exception:
+            raise
+
+        row_count = len(diagnostic_data)
 
     ###########################################################################
     # Interpret diagnostic data
     ###########################################################################
 
     # Check if there is enough data
-    if len(diagnostic_data) < 1:
+    if row_count < 1:
         print("Not enough diagnostic data to determine gamma and epsilon rates.")
         exit(1)
 
-    # Initialize a bit counter. Each bit starts at 0. If a "1" is read, increment
-    # the bit counter by 1. If a "0" is read, decrement the bit counter by 1.
-    #
-    # This method is used because the data is read in from the files as rows of
-    # data. The gamma and epsilon rates are determined by columns of data. This
-    # method will aggregate the column values (gamma and epsilon rates) by
-    # reading each row.
-    bit_counter = [0] * len(diagnostic_data[0])
-
-    # Read each line of diagnostic data
-    for line_number, bits in enumerate(diagnostic_data, 1):
-        # Read each bit
-        for index, bit in enumerate(bits):
-            # Bit value is 1
-            if bit == "1":
-                bit_counter[index] += 1
-            # Bit value is 0
-            elif bit == "0":
-                bit_counter[index] -= 1
-            # Invalid bit value
-            else:
-                print("ERROR: Invalid bit value found on line number {} bit number {}.".format(line_number, index+1))
+    # Sharded, vectorized and wide modes already counted the bits
+    if not args.shards and not args.vectorized and not args.wide:
+        # Initialize a bit counter. Each bit starts at 0. If a "1" is read, increment
+        # the bit counter by 1. If a "0" is read, decrement the bit counter by 1.
+        #
+        # This method is used because the data is read in from the files as rows of
+        # data. The gamma and epsilon rates are determined by columns of data. This
+        # method will aggregate the column values (gamma and epsilon rates) by
+        # reading each row.
+        bit_counter = [0] * len(diagnostic_data[0])
+
+        # Read each line of diagnostic data
+        for line_number, bits in enumerate(diagnostic_data, 1):
+            # Read each bit
+            for index, bit in enumerate(bits):
+                # Bit value is 1
+                if bit == "1":
+                    bit_counter[index] += 1
+                # Bit value is 0
+                elif bit == "0":
+                    bit_counter[index] -= 1
+                # Invalid bit value
+                else:
+                    print("ERROR: Invalid bit value found on line number {} bit number {}.".format(line_number, index+1))
 
     ###########################################################################
     # Determine gamma and epsilon rates
@@ -2,6 +2,8 @@
 
 import argparse
 
+from diagnostics import SELECTION_RULES, DiagnosticTrie, find_rating_packed, find_rating_sorted, least_common_bit, map_diagnostic_file, most_common_bit, pack_bit_matrix
+
 
 def filter_data(dataset, bit_index, bit_value):
     """ Filter the given dataset. Keep all the values that have the given bit
@@ -151,18 +153,36 @@ def main():
 
     parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("file", help="Text file with diagnostic data.")
+    parser.add_argument("-s", "--sorted", action="store_true", help="Sort the values once and narrow a range with bisect for each bit")
+    parser.add_argument("-t", "--trie", action="store_true", help="Build a trie with subtree counts once and walk it for each rating")
+    parser.add_argument("-w", "--wide", action="store_true", help="Pack each value into bytes and filter on unpacked bit columns (for values thousands of bits wide)")
+    parser.add_argument("-r", "--rule", choices=sorted(SELECTION_RULES), action="append", default=[], help="Also report the rating for this selection rule (with --trie)")
 
     args = parser.parse_args()
 
+    # Extra selection rules walk the trie
+    if args.rule and not args.trie:
+        parser.error("--rule needs --trie")
+
+    # Wide mode keeps the values packed; the other modes need strings
+    if args.wide and (args.sorted or args.trie):
+        parser.error("--wide can't be used with --sorted or --trie")
+
     ###########################################################################
     # Read in directions
     ###########################################################################
 
-    try:
-        with open(args.file, 'r') as FILE:
-            diagnostic_data = [value.strip() for value in FILE.readlines()]
-    except Exception:
-        raise
+    # Wide mode. Pack the values 8 bits per byte straight from the memory
+    # mapped file.
+    if args.wide:
+        packed, bit_count = pack_bit_matrix(*map_diagnostic_file(args.file))
+        diagnostic_data = packed
+    else:
+        try:
+            with open(args.file, 'r') as FILE:
+                diagnostic_data = [value.strip() for value in FILE.readlines()]
+        except Exception:
+            raise
 
     ###########################################################################
     # Interpret diagnostic data
@@ -173,9 +193,34 @@ def main():
         print("Not enough diagnostic data to determine gamma and epsilon rates.")
         exit(1)
 
-    # Get the oxygen generator and CO2 scrubber ratings
-    oxygen_generator_rating = get_oxygen_generator_rating(diagnostic_data)
-    co2_scrubber_rating = get_co2_scrubber_rating(diagnostic_data)
+    if args.trie or args.wide or args.sorted:
+        # Trie mode. Count once; each rating is a walk down the trie.
+        if args.trie:
+            diagnostic_trie = DiagnosticTrie(diagnostic_data)
+
+            oxygen_generator_rating = diagnostic_trie.findRating(most_common_bit)
+            co2_scrubber_rating = diagnostic_trie.findRating(least_common_bit)
+        # Wide mode. Filter row numbers on one unpacked bit column at a time.
+        elif args.wide:
+            oxygen_generator_rating = find_rating_packed(packed, bit_count, most_common_bit)
+            co2_scrubber_rating = find_rating_packed(packed, bit_count, least_common_bit)
+        # Sorted mode. Sort once; both ratings narrow a range of the sorted
+        # values.
+        else:
+            sorted_diagnostic_data = sorted(diagnostic_data)
+
+            oxygen_generator_rating = find_rating_sorted(sorted_diagnostic_data, most_common_bit)
+            co2_scrubber_rating = find_rating_sorted(sorted_diagnostic_data, least_common_bit)
+
+        # Failed to find a rating
+        if oxygen_generator_rating < 0:
+            print("ERROR: Failed to find oxygen generator rating.")
+        if co2_scrubber_rating < 0:
+            print("ERROR: Failed to find CO2 scrubber rating.")
+    else:
+        # Get the oxygen generator and CO2 scrubber ratings
+        oxygen_generator_rating = get_oxygen_generator_rating(diagnostic_data)
+        co2_scrubber_rating = get_co2_scrubber_rating(diagnostic_data)
 
     ###########################################################################
     # Report
@@ -185,6 +230,10 @@ def main():
     print("Submarine CO2 scrubber rating:     {}".format(co2_scrubber_rating))
     print("Life support rating:               {}".format(oxygen_generator_rating * co2_scrubber_rating))
 
+    # Other selection rules walk the same trie
+    for rule in args.rule:
+        print("Rating with the {} rule: {}".format(rule, diagnostic_trie.findRating(SELECTION_RULES[rule])))
+
     # Figure out the return code and exit
     return_code = 1 if oxygen_generator_rating < 0 or co2_scrubber_rating < 0 else 0
     exit(return_code)
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+
+# NumPy is only needed for the vectorized engine
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of cards to rank at a time in the vectorized engine
+BLOCK_CARDS = 64 * 1024
+
+
+def require_numpy():
+    """ Make sure NumPy is available. The vectorized engine needs it.
+
+        Input:  None
+
+        Output: None
+    """
+    if numpy is None:
+        raise ImportError("NumPy is required for the vectorized Bingo engine.")
+
+
+def rank_drawn_numbers(drawn_numbers):
+    """ Map each drawn number to its draw index (the turn it's drawn on). A
+        number drawn more than once keeps its first turn.
+
+        Input:  drawn numbers [ number <int> ]
+
+        Output: draw index of each number { number <int>: draw index <int> }
+    """
+    draw_ranks = {}
+
+    for draw_index, drawn_number in enumerate(drawn_numbers):
+        draw_ranks.setdefault(drawn_number, draw_index)
+
+    return draw_ranks
+
+
+def find_win_turn(card_numbers, draw_ranks, never):
+    """ Find the turn a card wins on. A row or column is complete on the turn
+        its last number is drawn (the largest draw index in the line). The card
+        wins on the first turn any of its lines is complete.
+
+        Input:  bingo card numbers [ row of numbers [ number <int> ] ]
+                draw index of each number { number <int>: draw index <int> }
+                draw index for numbers that are never drawn <int>
+
+        Output: win turn, never if the card doesn't win <int>
+    """
+    # Draw index of every number on the card
+    card_ranks = [[draw_ranks.get(number, never) for number in row] for row in card_numbers]
+
+    row_win_turn = min(max(row) for row in card_ranks)
+    column_win_turn = min(max(column) for column in zip(*card_ranks))
+
+    return min(row_win_turn, column_win_turn)
+
+
+def find_win_turns(drawn_numbers, cards_numbers):
+    """ Find the turn each card wins on and its final score, without playing
+        the draws. Each number is ranked by its draw index once; each card is
+        then a single pass over its numbers.
+
+        The final score is the sum of the numbers still unmarked on the win
+        turn (drawn later, or never) times the number drawn on the win turn.
+
+        Input:  drawn numbers [ number <int> ]
+                bingo cards [ bingo card numbers [ row of numbers [ number <int> ] ] ]
+
+        Output: win turns, len(drawn numbers) for cards that don't win [ win turn <int> ]
+                final scores, 0 for cards that don't win [ final score <int> ]
+    """
+    draw_ranks = rank_drawn_numbers(drawn_numbers)
+    never = len(drawn_numbers)
+
+    win_turns = []
+    final_scores = []
+
+    for card_numbers in cards_numbers:
+        win_turn = find_win_turn(card_numbers, draw_ranks, never)
+
+        # The card never gets Bingo
+        if win_turn == never:
+            final_score = 0
+        else:
+            unmarked_sum = sum(number for row in card_numbers for number in row if draw_ranks.get(number, never) > win_turn)
+            final_score = unmarked_sum * drawn_numbers[win_turn]
+
+        win_turns.append(win_turn)
+        final_scores.append(final_score)
+
+    return win_turns, final_scores
+
+
+class BingoIndex(object):
+    """ An inverted index of Bingo cards. Each number maps to the cells it's
+        in (card, row, column), so a draw only touches the cards with the
+        number on them. A line is complete the moment its counter reaches the
+        length of the line.
+
+        Input:  bingo cards [ bingo card numbers [ row of numbers [ number <int> ] ] ]
+    """
+    def __init__(self, cards_numbers):
+        # Cells of each number { number <int>: [ (card <int>, row <int>, column <int>) ] }
+        self.__number_cells = {}
+
+        # Number of marked numbers in each row and column of each card
+        self.__row_counts = []
+        self.__column_counts = []
+
+        # Sum of each card's unmarked numbers
+        self.__unmarked_sums = []
+
+        # Numbers that have been drawn
+        self.__drawn_numbers = set()
+
+        # Cards with Bingo
+        self.__cards_with_bingo = set()
+
+        for card, card_numbers in enumerate(cards_numbers):
+            for row, row_numbers in enumerate(card_numbers):
+                for column, number in enumerate(row_numbers):
+                    self.__number_cells.setdefault(number, []).append((card, row, column))
+
+            self.__row_counts.append([0] * len(card_numbers))
+            self.__column_counts.append([0] * len(card_numbers[0]))
+            self.__unmarked_sums.append(sum(number for row_numbers in card_numbers for number in row_numbers))
+
+    def drawNumber(self, number):
+        """ Mark a drawn number on every card it's on.
+
+            Input:  drawn number <int>
+
+            Output: cards that got Bingo on this draw, in card order [ card <int> ]
+        """
+        new_cards_with_bingo = []
+
+        # A number is only marked once
+        if number in self.__drawn_numbers:
+            return new_cards_with_bingo
+
+        self.__drawn_numbers.add(number)
+
+        for card, row, column in self.__number_cells.get(number, []):
+            row_counts = self.__row_counts[card]
+            column_counts = self.__column_counts[card]
+
+            self.__unmarked_sums[card] -= number
+            row_counts[row] += 1
+            column_counts[column] += 1
+
+            # The row (one number per column) or the column (one number per
+            # row) is complete
+            if row_counts[row] == len(column_counts) or column_counts[column] == len(row_counts):
+                if card not in self.__cards_with_bingo:
+                    self.__cards_with_bingo.add(card)
+                    new_cards_with_bingo.append(card)
+
+        return new_cards_with_bingo
+
+    def getBingoCount(self):
+        """ Get the number of cards with Bingo.
+
+            Input:  None
+
+            Output: number of cards with Bingo <int>
+        """
+        return len(self.__cards_with_bingo)
+
+    def getFinalScore(self, card, winning_number):
+        """ Calculate a card's final score using the given winning drawn number.
+
+            Input:  card <int>
+                    winning drawn number <int>
+
+            Output: final score <int>
+        """
+        return self.__unmarked_sums[card] * winning_number
+
+
+def play_bingo_indexed(drawn_numbers, cards_numbers, last=False):
+    """ Play the draws with an inverted index of the cards. Stops after the
+        first draw with a Bingo, or with last after every card has Bingo.
+
+        Input:  drawn numbers [ number <int> ]
+                bingo cards [ bingo card numbers [ row of numbers [ number <int> ] ] ]
+                play until every card has Bingo <bool>
+
+        Output: win turns, len(drawn numbers) for cards without Bingo [ win turn <int> ]
+                final scores, 0 for cards without Bingo [ final score <int> ]
+    """
+    bingo_index = BingoIndex(cards_numbers)
+
+    win_turns = [len(drawn_numbers)] * len(cards_numbers)
+    final_scores = [0] * len(cards_numbers)
+
+    for draw_index, drawn_number in enumerate(drawn_numbers):
+        new_cards_with_bingo = bingo_index.drawNumber(drawn_number)
+
+        for card in new_cards_with_bingo:
+            win_turns[card] = draw_index
+            final_scores[card] = bingo_index.getFinalScore(card, drawn_number)
+
+        # Stop drawing numbers
+        if new_cards_with_bingo and not last:
+            break
+        if bingo_index.getBingoCount() == len(cards_numbers):
+            break
+
+    return win_turns, final_scores
+
+
+def load_bingo_cards_array(file_name, rows=5, columns=5):
+    """ Read the drawn numbers and every Bingo card of a Bingo file into
+        arrays. The card numbers are parsed in one go into a (cards, rows,
+        columns) array, so millions of cards fit in memory. The first row of
+        the first card is checked against the number of columns.
+
+        Input:  file name <str>
+                number of rows in a card <int>
+                number of columns in a card <int>
+
+        Output: drawn numbers <numpy.ndarray int64 (draws,)>
+                bingo cards <numpy.ndarray int64 (cards, rows, columns)>
+    """
+    require_numpy()
+
+    with open(file_name, 'r') as FILE:
+        drawn_numbers = numpy.array(FILE.readline().split(","), dtype=numpy.int64)
+        card_data = FILE.read()
+
+    # The first row of the first card
+    first_row = card_data.strip().split("\n", 1)[0].split()
+
+    # No cards
+    if not first_row:
+        return drawn_numbers, numpy.empty((0, rows, columns), dtype=numpy.int64)
+
+    if len(first_row) != columns:
+        raise ValueError("The cards have {} columns, not {}.".format(len(first_row), columns))
+
+    card_numbers = numpy.fromstring(card_data, dtype=numpy.int64, sep=" ")
+
+    if len(card_numbers) % (rows * columns):
+        raise ValueError("The card numbers don't make whole {}x{} cards.".format(rows, columns))
+
+    return drawn_numbers, card_numbers.reshape(-1, rows, columns)
+
+
+def find_win_turns_vectorized(drawn_numbers, cards, block_cards=BLOCK_CARDS):
+    """ Find the turn each card wins on and its final score with array
+        reductions. Every card number is looked up in the sorted drawn numbers
+        to get its draw index (len(drawn numbers) if it's never drawn), so any
+        int64 numbers work, negative or huge. A line is complete on the
+        largest draw index in it and a card wins on its earliest complete
+        line, the same as find_win_turns().
+
+        Input:  drawn numbers <numpy.ndarray int64 (draws,)>
+                bingo cards <numpy.ndarray int64 (cards, rows, columns)>
+                number of cards to rank at a time <int>
+
+        Output: win turns, len(drawn numbers) for cards that don't win <numpy.ndarray int64 (cards,)>
+                final scores, 0 for cards that don't win <numpy.ndarray int64 (cards,)>
+    """
+    require_numpy()
+
+    never = len(drawn_numbers)
+
+    # The drawn numbers in sorted order and the first turn each is drawn on
+    unique_numbers, draw_ranks = numpy.unique(drawn_numbers, return_index=True)
+
+    # A number larger than every drawn number is looked up past the end, where
+    # it's never drawn
+    unique_numbers = numpy.append(unique_numbers, 0)
+    draw_ranks = numpy.append(draw_ranks, never)
+
+    # The number drawn on each turn. Cards that don't win score 0.
+    winning_numbers = numpy.append(drawn_numbers, 0)
+
+    win_turns = numpy.empty(len(cards), dtype=numpy.int64)
+    final_scores = numpy.empty(len(cards), dtype=numpy.int64)
+
+    for start in range(0, len(cards), block_cards):
+        block = cards[start:start+block_cards]
+
+        # Draw index of each number. Numbers that weren't found are never
+        # drawn.
+        positions = numpy.searchsorted(unique_numbers[:-1], block)
+        block_ranks = numpy.where(unique_numbers[positions] == block, draw_ranks[positions], never)
+
+        # Earliest complete row or column
+        row_win_turns = block_ranks.max(axis=2).min(axis=1)
+        column_win_turns = block_ranks.max(axis=1).min(axis=1)
+        block_win_turns = numpy.minimum(row_win_turns, column_win_turns)
+
+        # Numbers drawn after the win turn are still unmarked
+        unmarked_sums = numpy.where(block_ranks > block_win_turns[:, None, None], block, 0).sum(axis=(1, 2))
+
+        win_turns[start:start+len(block)] = block_win_turns
+        final_scores[start:start+len(block)] = unmarked_sums * winning_numbers[block_win_turns]
+
+    return win_turns, final_scores
+
+
+def row_masks(rows, columns):
+    """ Win pattern. Every row. Cell (row, column) is bit row * columns + column.
+
+        Input:  number of rows <int>
+                number of columns <int>
+
+        Output: win masks [ mask <int> ]
+    """
+    return [((1 << columns) - 1) << (row * columns) for row in range(rows)]
+
+
+def column_masks(rows, columns):
+    """ Win pattern. Every column.
+
+        Input:  number of rows <int>
+                number of columns <int>
+
+        Output: win masks [ mask <int> ]
+    """
+    return [sum(1 << (row * columns + column) for row in range(rows)) for column in range(columns)]
+
+
+def diagonal_masks(rows, columns):
+    """ Win pattern. Both diagonals. Only square cards have diagonals.
+
+        Input:  number of rows <int>
+                number of columns <int>
+
+        Output: win masks [ mask <int> ]
+    """
+    if rows != columns:
+        raise ValueError("Only square cards have diagonals ({}x{}).".format(rows, columns))
+
+    return [sum(1 << (index * columns + index) for index in range(rows)),
+            sum(1 << (index * columns + columns - 1 - index) for index in range(rows))]
+
+
+def corner_masks(rows, columns):
+    """ Win pattern. All four corners.
+
+        Input:  number of rows <int>
+                number of columns <int>
+
+        Output: win masks [ mask <int> ]
+    """
+    corners = {(0, 0), (0, columns - 1), (rows - 1, 0), (rows - 1, columns - 1)}
+
+    return [sum(1 << (row * columns + column) for row, column in corners)]
+
+
+def blackout_masks(rows, columns):
+    """ Win pattern. Every number on the card.
+
+        Input:  number of rows <int>
+                number of columns <int>
+
+        Output: win masks [ mask <int> ]
+    """
+    return [(1 << (rows * columns)) - 1]
+
+
+# Win patterns by name. Rows and columns are played unless other patterns are
+# chosen.
+WIN_PATTERNS = {
+    "rows": row_masks,
+    "columns": column_masks,
+    "diagonals": diagonal_masks,
+    "corners": corner_masks,
+    "blackout": blackout_masks,
+}
+DEFAULT_WIN_PATTERNS = ("rows", "columns")
+
+
+def build_win_masks(rows, columns, patterns=DEFAULT_WIN_PATTERNS):
+    """ Build the win masks of the given win patterns.
+
+        Input:  number of rows <int>
+                number of columns <int>
+                win pattern names [ name <str> ]
+
+        Output: win masks, without repeats [ mask <int> ]
+    """
+    win_masks = []
+
+    for pattern in patterns:
+        for mask in WIN_PATTERNS[pattern](rows, columns):
+            if mask not in win_masks:
+                win_masks.append(mask)
+
+    return win_masks
+
+
+class BitmaskBingoCard(object):
+    """ A Bingo card whose marks are the bits of one integer. Cell (row,
+        column) is bit row * columns + column. The card has Bingo when all the
+        bits of any win mask are marked.
+
+        Input:  bingo card numbers [ row of numbers [ number <int> ] ]
+                win masks [ mask <int> ]
+    """
+    def __init__(self, numbers, win_masks):
+        column_count = len(numbers[0])
+
+        # Bit of each number on the card
+        self.__numbers_bits = {number: 1 << (row * column_count + column) for row, row_numbers in enumerate(numbers) for column, number in enumerate(row_numbers)}
+
+        # Marked numbers
+        self.__marks = 0
+
+        self.__win_masks = win_masks
+
+    def calculateFinalScore(self, winning_number):
+        """ Calculate the final score using the given winning drawn number.
+
+            Input:  winning drawn number <int>
+
+            Output: final score <int>
+        """
+        unmarked_sum = sum(number for number, bit in self.__numbers_bits.items() if not self.__marks & bit)
+
+        return unmarked_sum * winning_number
+
+    def checkForBingo(self):
+        """ Check the card for Bingo.
+
+            Input:  None
+
+            Output: is there bingo <bool>
+        """
+        marks = self.__marks
+
+        return any(marks & mask == mask for mask in self.__win_masks)
+
+    def markNumber(self, number):
+        """ Mark a number, if it exists, on the Bingo card.
+
+            Input:  number <int>
+
+            Output: was the number on the card <bool>
+        """
+        bit = self.__numbers_bits.get(number, 0)
+        self.__marks |= bit
+
+        return bit != 0
+
+
+def play_bingo_bitmask(drawn_numbers, cards_numbers, win_masks, last=False):
+    """ Play the draws on bitmask Bingo cards. A card is only checked for
+        Bingo when a drawn number is on it. Stops after the first draw with a
+        Bingo, or with last after every card has Bingo.
+
+        Input:  drawn numbers [ number <int> ]
+                bingo cards [ bingo card numbers [ row of numbers [ number <int> ] ] ]
+                win masks [ mask <int> ]
+                play until every card has Bingo <bool>
+
+        Output: win turns, len(drawn numbers) for cards without Bingo [ win turn <int> ]
+                final scores, 0 for cards without Bingo [ final score <int> ]
+    """
+    bingo_cards = [BitmaskBingoCard(card_numbers, win_masks) for card_numbers in cards_numbers]
+
+    win_turns = [len(drawn_numbers)] * len(bingo_cards)
+    final_scores = [0] * len(bingo_cards)
+
+    # Cards without Bingo
+    cards_left = list(range(len(bingo_cards)))
+
+    for draw_index, drawn_number in enumerate(drawn_numbers):
+        still_left = []
+
+        for card in cards_left:
+            bingo_card = bingo_cards[card]
+
+            if bingo_card.markNumber(drawn_number) and bingo_card.checkForBingo():
+                win_turns[card] = draw_index
+                final_scores[card] = bingo_card.calculateFinalScore(drawn_number)
+            else:
+                still_left.append(card)
+
+        # Stop drawing numbers
+        if len(still_left) < len(cards_left) and not last:
+            break
+
+        cards_left = still_left
+
+        if not cards_left:
+            break
+
+    return win_turns, final_scores
@@ -3,6 +3,8 @@
 import argparse
 import re
 
+from bingo import DEFAULT_WIN_PATTERNS, WIN_PATTERNS, build_win_masks, find_win_turns, find_win_turns_vectorized, load_bingo_cards_array, play_bingo_bitmask, play_bingo_indexed
+
 
 class BingoCard(object):
     """ A class that represents the state of a Bingo board. This class will
@@ -128,6 +130,48 @@ class BingoCard(object):
         print()
 
 
+def report_first_bingo(drawn_numbers, bingo_cards_numbers, win_turns, final_scores):
+    """ Report the cards that get Bingo first from their win turns, the same
+        way as playing the draws. The winning cards are replayed up to their
+        win turn to print them.
+
+        Input:  drawn numbers [ number <int> ]
+                bingo cards [ bingo card numbers [ row of numbers [ number <int> ] ] ]
+                win turns [ win turn <int> ]
+                final scores [ final score <int> ]
+
+        Output: None
+    """
+    # Turn of the first Bingo. len(drawn numbers) if no card gets Bingo.
+    first_win_turn = min(win_turns, default=len(drawn_numbers))
+
+    print("Drawing Numbers: ", end="")
+
+    for drawn_number in drawn_numbers[:first_win_turn + 1]:
+        print("{} ".format(drawn_number), end="")
+
+    # No card gets Bingo
+    if first_win_turn == len(drawn_numbers):
+        return
+
+    # Every card that gets Bingo on the first win turn
+    for card_index, win_turn in enumerate(win_turns):
+        if win_turn == first_win_turn:
+            # Replay the draws on the card
+            bingo_card = BingoCard(bingo_cards_numbers[card_index])
+            for drawn_number in drawn_numbers[:win_turn + 1]:
+                bingo_card.markNumber(drawn_number)
+
+            print("\n")
+            print("**********")
+            print("* BINGO! *")
+            print("**********")
+            print()
+            bingo_card.print_card()
+            print()
+            print("Final Score: {}".format(final_scores[card_index]))
+
+
 def main():
     """ Read in the Bingo numbers provided by the given file. Report which
         Bingo card wins by adding all the winning card's numbers then
@@ -145,13 +189,35 @@ def main():
     parser.add_argument("file", help="Text file with Bingo numbers.")
     parser.add_argument("-r", "--rows", help="Number of rows in a card", default=5)
     parser.add_argument("-c", "--columns", help="Number of columns in a card", default=5)
+    parser.add_argument("-w", "--win-turns", action="store_true", help="Find each card's win turn from the draw order instead of playing the draws")
+    parser.add_argument("-i", "--index", action="store_true", help="Play the draws with an index of the cells each number is in")
+    parser.add_argument("-v", "--vectorized", action="store_true", help="Parse every card into one NumPy array and find the win turns with array reductions")
+    parser.add_argument("-m", "--bitmask", action="store_true", help="Mark the cards as bits of an integer and check them against win masks")
+    parser.add_argument("-p", "--pattern", choices=sorted(WIN_PATTERNS), action="append", default=[], help="Win with this pattern (with --bitmask). Defaults to rows and columns.")
 
     args = parser.parse_args()
 
+    # Win patterns need the bitmask cards
+    if args.pattern and not args.bitmask:
+        parser.error("--pattern needs --bitmask")
+
     ###########################################################################
     # Read in directions
     ###########################################################################
 
+    # Vectorized mode. Parse every card into one array and find the win turns
+    # with array reductions.
+    if args.vectorized:
+        try:
+            drawn_numbers, bingo_cards_array = load_bingo_cards_array(args.file, int(args.rows), int(args.columns))
+        except ValueError as error:
+            print("ERROR: {}".format(error))
+            exit(1)
+
+        win_turns, final_scores = find_win_turns_vectorized(drawn_numbers, bingo_cards_array)
+        report_first_bingo(drawn_numbers.tolist(), bingo_cards_array, win_turns.tolist(), final_scores.tolist())
+        exit(0)
+
     try:
         with open(args.file, 'r') as FILE:
             bingo_data = [value.strip() for value in FILE.readlines()]
@@ -163,10 +229,10 @@ def main():
     ###########################################################################
 
     # Get the drawn numbers from the input file
-    drawn_numbers = bingo_data[0].split(",")
+    drawn_numbers = [int(drawn_number) for drawn_number in bingo_data[0].split(",")]
 
-    # All the Bingo cards
-    bingo_cards = []
+    # All the Bingo cards' numbers
+    bingo_cards_numbers = []
 
     # Current Bingo card numbers
     bingo_card_numbers = []
@@ -180,8 +246,8 @@ def main():
 
         # If enough rows have been accumulated
         if len(bingo_card_numbers) == args.rows:
-            # Create a new Bingo card
-            bingo_cards.append(BingoCard(bingo_card_numbers))
+            # Add the Bingo card's numbers
+            bingo_cards_numbers.append([[int(number) for number in row] for row in bingo_card_numbers])
 
             # Clear the Bingo card numbers for the next card
             bingo_card_numbers = []
@@ -189,6 +255,26 @@ def main():
     # Loop control
     stop_loop = False
 
+    if args.win_turns or args.index or args.bitmask:
+        # Win turn mode. Rank the drawn numbers once and find the turn each
+        # card gets Bingo on without playing the draws.
+        if args.win_turns:
+            win_turns, final_scores = find_win_turns(drawn_numbers, bingo_cards_numbers)
+        # Index mode. A draw only touches the cards with the number on them.
+        elif args.index:
+            win_turns, final_scores = play_bingo_indexed(drawn_numbers, bingo_cards_numbers)
+        # Bitmask mode. Marks are bits; a card has Bingo when any win mask is
+        # all marked.
+        else:
+            win_masks = build_win_masks(int(args.rows), int(args.columns), args.pattern or DEFAULT_WIN_PATTERNS)
+            win_turns, final_scores = play_bingo_bitmask(drawn_numbers, bingo_cards_numbers, win_masks)
+
+        report_first_bingo(drawn_numbers, bingo_cards_numbers, win_turns, final_scores)
+        exit(0)
+
+    # All the Bingo cards
+    bingo_cards = [BingoCard(bingo_card_numbers) for bingo_card_numbers in bingo_cards_numbers]
+
     print("Drawing Numbers: ", end="")
 
     # Drawn numbers